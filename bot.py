@@ -11,7 +11,9 @@ from discord.ext.commands import AutoShardedBot
 from command_tree import ApplicationCommandTree
 from ui.views.persistant import LFGPingViewPersistent, LFGRegisterViewPersistent
 from utils.config_manager import ConfigManager
+from utils.dm_queue import DirectMessageQueue
 from utils.media_manager import MediaManager
+from utils.message_ops import MessageOperations
 from utils.utils import scan_cogs
 
 if typing.TYPE_CHECKING:
@@ -39,6 +41,8 @@ class Neria(AutoShardedBot):
         )
 
         self.interaction_income_mapping = {}
+        self.dm_queue = DirectMessageQueue(self)
+        self.message_ops = MessageOperations(self)
 
     async def on_message(self, message: discord.Message, /) -> None:
         """
@@ -49,6 +53,7 @@ class Neria(AutoShardedBot):
         return
 
     async def setup_hook(self) -> None:
+        self.dm_queue.start()
         await self.load_extensions()
         self.loop.create_task(self.update_emojis())
         self.loop.create_task(self.update_emoji_icons())
@@ -59,6 +64,10 @@ class Neria(AutoShardedBot):
         else:
             await self.tree.sync()
 
+    async def close(self) -> None:
+        await self.dm_queue.shutdown()
+        await super().close()
+
     @property
     def ver(self):
         return ConfigManager.get_setting("version")
@@ -5,9 +5,11 @@ from discord.ext.commands import GroupCog
 from locales.gen import LanguageSchema
 
 from bot import Neria
-from persistence.models import Server, Users, PlayerCharacter
+from persistence import EventStates
+from persistence.models import Server, Users, PlayerCharacter, Event
 from ui.modals.settings_modals import CharacterCreateModal
 from ui.views.selects import CharactersSelectView, ClassesSelectView
+from utils.caches import EventEmbedCache
 from utils.overwrites import BetterEmbed, LangAvailable
 from utils.static import StaticIdMaps, PlayerClass, MainClasses, ClassRepresentation
 
@@ -98,6 +100,7 @@ class AccountManager(GroupCog, LangAvailable, group_name="character", group_desc
         character.character_name = result["character_name"]
         character.item_lvl = result["item_lvl"]
         await character.save()
+        self.refresh_events(await self.active_events_of(character))
         embed.change_type(BetterEmbed.OK)
         embed.set_header(lang.edited_title.get_string())
         embed.description = lang.edit_complete.get_string(character.character_name)
@@ -126,9 +129,24 @@ class AccountManager(GroupCog, LangAvailable, group_name="character", group_desc
         embed.set_header(lang.deleted_title.get_string(character.character_name))
         embed.description = lang.deleted_desc.get_string(character.character_name)
         embed.change_type(BetterEmbed.ERROR)
+        # Collected first, the registrations are removed together with the character
+        events = await self.active_events_of(character)
         await character.delete()
+        self.refresh_events(events)
         await interaction.response.edit_message(embed=embed, view=None)
 
+    @staticmethod
+    async def active_events_of(character: PlayerCharacter) -> list[Event]:
+        return await Event.filter(registered_users__character_id=character.id, state=EventStates.PLANING)
+
+    def refresh_events(self, events: list[Event]):
+        """
+        Characters are shown in event embeds, so cached renders and posted messages of their events get outdated
+        """
+        for event in events:
+            EventEmbedCache.invalidate(event.id)
+            self.bot.event_manager.refresh_event_message(event)
+
 
 async def setup(bot: Neria):
     await bot.add_cog(AccountManager(bot))
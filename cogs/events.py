@@ -1,4 +1,5 @@
 import asyncio
+import typing
 
 import discord
 from discord import RawMessageDeleteEvent, AllowedMentions, Interaction, app_commands, Permissions
@@ -10,6 +11,8 @@ import utils.async_checks
 from bot import Neria
 from persistence import EventStates
 from persistence.models import Server, Users, Event, EventPreset, MessageDeleteQueue, EventRegister
+from persistence.repository import Repository, RosterRecord
+from persistence.roster import Roster
 from errors.basic import NotAPreset
 from ui.modals.settings_modals import PresetSettingsModal, CreateEventSettings, GetTimeModal
 from ui.views import LFGRegisterViewPersistent, PresetSettingsView, DeleteEventView, \
@@ -17,8 +20,11 @@ from ui.views import LFGRegisterViewPersistent, PresetSettingsView, DeleteEventV
 from ui.views.selects import ChooseEventSelect
 from utils import static
 from utils.auto_complete_callbacks import AutoCompleteCallbacks
+from utils.caches import EventEmbedCache
 from utils.config_manager import ConfigManager
+from utils.edit_coalescer import EditCoalescer
 from utils.media_manager import MediaManager
+from utils.metrics import Metrics
 from utils.overwrites import ExtCog, BetterEmbed
 from utils.static import DeleteTimeEnum
 from utils.utils import build_fields
@@ -30,6 +36,8 @@ class EventCog(ExtCog):
 
     def __init__(self, bot: Neria):
         self.bot: Neria = bot
+        self.message_edits = EditCoalescer("event_message_edits",
+                                           ConfigManager.get_setting_default("message_edit_delay", 1.0))
 
     def get_lang(self, lang: str) -> LanguageSchema.Commands.Event:
         return self.get_lang_by_reference(lang, LanguageSchema.Commands.Event)
@@ -56,6 +64,7 @@ class EventCog(ExtCog):
         except discord.HTTPException:
             event.state = EventStates.ENDED
             await event.save()
+            self.bot.scheduler.untrack_event(event)
 
     @event_group.command(description="Schedule a lfg")
     @app_commands.describe(preset="Choose a preset",
@@ -132,6 +141,7 @@ class EventCog(ExtCog):
             advanced_settings=advanced_settings,
             weekly=weekly
         )
+        self.bot.scheduler.track_event(event)
         e = await self.bot.event_manager.build_event_embed(event)
         await interaction.followup.edit_message(msg.id, embed=e)
 
@@ -170,6 +180,7 @@ class EventCog(ExtCog):
             await self.notify_canceled(result)
         result.state = EventStates.ENDED
         await result.save()
+        self.bot.scheduler.untrack_event(result)
         await self.delete_event_message(result)
 
     @event_group.command(description="Edit a running lfg")
@@ -316,11 +327,21 @@ class EventCog(ExtCog):
         return embed
 
     async def build_event_embed(self, event: Event):
-        await event.fetch_creator()
-        await event.fetch_server()
-        discord_user = self.bot.get_user(event.creator.id)
+        server = await Server.get_safe(event.server_id)
+        cached = EventEmbedCache.get(event.id, server.lang)
+        if cached is not None:
+            return cached
+        version = EventEmbedCache.version(event.id)
+        roster = await Repository.fetch_roster(event.id)
+        embed = self.render_event_embed(roster)
+        EventEmbedCache.put(event.id, roster.server.lang, embed, version)
+        return embed
+
+    def render_event_embed(self, roster: typing.Union[Roster, RosterRecord]):
+        event = roster.event
+        discord_user = self.bot.get_user(event.creator_id)
         lang: LanguageSchema.utils.event_message = get_language(
-            event.server.lang, LanguageSchema.utils.event_message)
+            roster.server.lang, LanguageSchema.utils.event_message)
 
         embed = BetterEmbed(BetterEmbed.DEFAULT)
         embed.set_header(event.title)
@@ -329,7 +350,6 @@ class EventCog(ExtCog):
         embed.add_field(name=lang.info_header.get_string(MediaManager.get_emoji("event_infos")),
                         value=lang.info_field.get_string(discord_user.mention,
                                                          event.event_start, event.max_players), inline=False)
-        await event.fetch_participants()
         main = []
         sub = []
 
@@ -341,19 +361,15 @@ class EventCog(ExtCog):
                 character.item_lvl
             ))
 
-        counter = 0
-        for register in event.registered_users:
-            await register.fetch_character()
+        for register in roster.registrations:
             if register.substitute:
                 foo(register.character, sub)
-                continue
-            if register.character.character_class.has_tag("support"):
-                counter += 1
-            foo(register.character, main)
+            else:
+                foo(register.character, main)
 
         if event.advanced_settings:
             roles = []
-            guild = self.bot.get_guild(event.server.id)
+            guild = self.bot.get_guild(roster.server.id)
             for role_id in event.advanced_settings.prio_roles:
                 role = guild.get_role(role_id)
                 if role:
@@ -363,7 +379,7 @@ class EventCog(ExtCog):
                 value=lang.advanced_value.get_string(
                     event.advanced_settings.min_gear_score,
                     event.advanced_settings.max_same_class,
-                    counter,
+                    roster.summary.support_count,
                     event.advanced_settings.min_supporters,
                     ", ".join(roles) if len(roles) > 0 else "`None`",
                     event.advanced_settings.prio_time,
@@ -373,7 +389,7 @@ class EventCog(ExtCog):
 
         build_fields(embed, lang.character_header.get_string(
             MediaManager.get_emoji("participant"),
-            event.registered_count, event.max_players
+            roster.summary.main_count, event.max_players
         ), main, lang.no_part.get_string())
 
         build_fields(embed, lang.subtitudes.get_string(MediaManager.get_emoji("substitute")), sub,
@@ -381,26 +397,40 @@ class EventCog(ExtCog):
         embed.set_default_thumbnail()
         return embed
 
+    def refresh_event_message(self, event: Event, interaction: typing.Optional[Interaction] = None):
+        """
+        Rebuild the embed of an event message after its roster changed.
+        Refreshes of the same message in quick succession are collapsed into one edit with the latest state.
+        :param event:
+        :param interaction: Interaction on the event message, its followup webhook is used for the edit.
+            Without one the message is edited by channel and message id.
+        :return:
+        """
+        async def edit():
+            if interaction is None:
+                await self.update_event_message(event)
+                return
+            embed = await self.build_event_embed(event)
+            await interaction.followup.edit_message(event.message_id, embed=embed)
+
+        self.message_edits.submit(event.message_id, edit)
+
     async def update_event_message(self, event: Event):
-        channel = self.bot.get_channel(event.channel_id)
-        message = await channel.fetch_message(event.message_id)
         embed = await self.build_event_embed(event)
-        await message.edit(embed=embed)
+        await self.bot.message_ops.edit(event.channel_id, event.message_id, embed=embed)
 
     async def notify_canceled(self, event: Event, user: discord.User = None):
-        server = await event.server
-        lang: LanguageSchema.utils.notify_cancel = get_language(server.lang, LanguageSchema.utils.notify_cancel)
-        await event.fetch_participants(include_users=True)
-        await event.fetch_creator()
+        roster = await Roster.load(event.id)
+        lang: LanguageSchema.utils.notify_cancel = get_language(roster.server.lang,
+                                                                LanguageSchema.utils.notify_cancel)
         q = []
         embed = BetterEmbed(BetterEmbed.INFO)
         embed.description = lang.desc.get_string(
-            self.bot.get_user(event.creator.id).mention if not user else user.mention, event.title, event.event_start)
+            self.bot.get_user(roster.creator.id).mention if not user else user.mention, event.title, event.event_start)
         embed.set_header(lang.title.get_string())
-        for entry in event.registered_users:
-            if entry.user.id != event.creator.id:
-                discord_user = self.bot.get_user(entry.user.id)
-                q.append(discord_user.send(embed=embed))
+        for entry in roster.registrations:
+            if entry.user_id != roster.creator.id:
+                q.append(self.bot.dm_queue.submit(entry.user_id, embed=embed))
         await asyncio.gather(*q, return_exceptions=True)
 
     async def on_event_start(self, event: Event):
@@ -443,22 +473,59 @@ class EventCog(ExtCog):
                     advanced_settings=event.advanced_settings,
                     weekly=True
                 )
+                self.bot.scheduler.track_event(new_event)
                 embed = await self.build_event_embed(new_event)
                 await msg.edit(embed=embed)
 
-    async def notify_all(self, event: Event):
-        await event.fetch_participants(include_users=True)
-        await event.fetch_server()
-        for register in event.registered_users:
-            await self.notify_start_user(register)
+    async def notify_all(self, event_id: int):
+        roster = await Roster.load(event_id)
+        await asyncio.gather(*[self.notify_start_user(register) for register in roster.registrations])
+
+    async def notify_start_users(self, registrations: list[EventRegister]):
+        """
+        Send start reminders for a batch of registrations.
+        Users with more than one reminder in the batch get a single DM listing all events,
+        one per server language so every event is shown in the language of its server.
+        :param registrations:
+        :return:
+        """
+        event_ids = {registration.event_id for registration in registrations}
+        events = {e.id: e for e in await Event.filter(id__in=event_ids).select_related("server")}
+        by_user: dict[tuple[int, str], list[EventRegister]] = {}
+        for registration in registrations:
+            registration.event = events[registration.event_id]
+            key = (registration.user_id, registration.event.server.lang)
+            by_user.setdefault(key, []).append(registration)
+        q = []
+        for user_registrations in by_user.values():
+            if len(user_registrations) == 1:
+                q.append(self.notify_start_user(user_registrations[0]))
+            else:
+                q.append(self.notify_start_user_combined(user_registrations))
+        await asyncio.gather(*q)
+
+    async def notify_start_user_combined(self, registrations: list[EventRegister]):
+        registrations = sorted(registrations, key=lambda r: r.event.event_start)
+        discord_user = self.bot.get_user(registrations[0].user_id)
+        if discord_user is None:
+            return
+        server = registrations[0].event.server  # All registrations share the language of their servers
+        lang: LanguageSchema.utils.notify_start = get_language(server.lang, LanguageSchema.utils.notify_start)
+        events = "".join(lang.event_template.get_string(r.event.title, r.event.event_start) for r in registrations)
+        embed = BetterEmbed(BetterEmbed.DEFAULT)
+        embed.set_header(lang.title_multiple.get_string())
+        embed.set_default_thumbnail()
+        embed.description = lang.desc_multiple.get_string(discord_user.mention, events)
+        Metrics.incr("reminders.coalesced", len(registrations) - 1)
+        try:
+            await self.bot.dm_queue.send(discord_user, embed=embed)
+        except HTTPException:
+            pass
 
     async def notify_start_user(self, registered_entry: EventRegister):
         event = await registered_entry.event
         server = await event.server
-        user = registered_entry.user
-        if not isinstance(user, Users):
-            user = await user
-        discord_user = self.bot.get_user(user.id)
+        discord_user = self.bot.get_user(registered_entry.user_id)
         if discord_user is None:
             return
         lang: LanguageSchema.utils.notify_start = get_language(server.lang, LanguageSchema.utils.notify_start)
@@ -467,27 +534,19 @@ class EventCog(ExtCog):
         embed.set_default_thumbnail()
         embed.description = lang.desc.get_string(discord_user.mention, event.title, event.event_start)
         try:
-            await discord_user.send(embed=embed)
+            await self.bot.dm_queue.send(discord_user, embed=embed)
         except HTTPException:
             pass
 
     async def change_view_event_message(self, event: Event, view=None):
         try:
-            channel = self.bot.get_channel(event.channel_id)
-            if channel is None:
-                return
-            msg = await channel.fetch_message(event.message_id)
-            await msg.edit(view=view)
+            await self.bot.message_ops.edit(event.channel_id, event.message_id, view=view)
         except discord.HTTPException:
             return
 
     async def delete_event_message(self, event: Event):
         try:
-            channel = self.bot.get_channel(event.channel_id)
-            if channel is None:
-                return
-            msg = await channel.fetch_message(event.message_id)
-            await msg.delete()
+            await self.bot.message_ops.delete(event.channel_id, event.message_id)
         except discord.HTTPException:
             return
 
@@ -5,7 +5,8 @@ import discord
 from discord import app_commands
 
 from bot import Neria
-from persistence.models import Server, Users
+from persistence.models import Server
+from persistence.repository import Repository
 from locales.gen import LanguageSchema
 from utils.config_manager import ConfigManager
 from utils.media_manager import MediaManager
@@ -99,15 +100,14 @@ class General(ExtCog):
             embed.set_header(lang.title_self.get_string())
         else:
             embed.set_header(lang.title_other.get_string(user.name))
-        db_user = await Users.get_safe(user.id)
-        await db_user.fetch_characters()
-        await db_user.fetch_registered_events()
+        characters = await Repository.fetch_characters(user.id)
+        events = await Repository.fetch_profile_events(user.id)
         embed.description = lang.desc.get_string(user.mention)
-        if len(db_user.characters) == 0:
+        if len(characters) == 0:
             field_desc = lang.no_char.get_string()
         else:
             s = io.StringIO()
-            for i in db_user.characters:
+            for i in characters:
                 s.write(lang.class_template.get_string(
                     MediaManager.get_emoji(i.character_class.emoji_name),
                     i.character_name, i.character_class.name, i.item_lvl
@@ -123,17 +123,15 @@ class General(ExtCog):
             name=lang.char_field_title.get_string(MediaManager.get_emoji("default")),
             value=field_desc
         )
-        if len([i for i in db_user.registered_for if not i.event.has_ended]) == 0:
+        if len(events) == 0:
             event_field_desc = lang.no_event.get_string()
         else:
             s = io.StringIO()
             counter = 1
-            for register in db_user.registered_for:
-                if register.event.has_ended:
-                    continue
+            for event in events:
                 s.write(lang.event_template.get_string(
-                    counter, register.event.title, register.event.event_start,
-                    get_message_link(interaction.guild.id, register.event.channel_id, register.event.message_id)))
+                    counter, event.title, event.event_start,
+                    get_message_link(interaction.guild.id, event.channel_id, event.message_id)))
                 counter += 1
             event_field_desc = s.getvalue()
         embed.add_field(
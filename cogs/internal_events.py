@@ -37,6 +37,16 @@ class InternalEventsCog(commands.cog.Cog):
     async def on_interaction(self, interaction: discord.Interaction):
         pass
 
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild: discord.Guild):
+        # Warm the guild settings cache, the first commands usually follow right after the join
+        await Server.get_safe(guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        # The row is kept, but nothing reads the settings of a guild the bot left
+        Server.invalidate_settings(guild.id)
+
     @commands.Cog.listener()
     async def on_handle_error(self, context: ContextInterface, exception: DiscordException) -> None:
         embed = BetterEmbed(BetterEmbed.ERROR)
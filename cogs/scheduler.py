@@ -1,5 +1,8 @@
 import asyncio
+import heapq
+import itertools
 import logging
+import random
 import time
 import typing
 from asyncio import Task
@@ -8,13 +11,18 @@ import aiohttp
 import discord
 
 from bs4 import BeautifulSoup
-from tortoise.expressions import F
 
 from persistence import EventStates
 from persistence.models import Event, MessageDeleteQueue, EventRegister
+from persistence.repository import Repository
 from utils.overwrites import ExtCog
 
 from bot import Neria
+from utils.caches import EventEmbedCache, EventMetaCache
+from utils.db_metrics import PoolMonitor
+from utils.config_manager import ConfigManager
+from utils.metrics import Metrics
+from utils.timers import DeadlineQueue, ReminderIndex
 from utils.utils import TimingContext
 
 logger = logging.getLogger("Neria")
@@ -25,18 +33,114 @@ class ScheduleManager(ExtCog):
     def __init__(self, bot: "Neria"):
         self.bot = bot
         self.scheduler = Scheduler()
+        self.event_timers = DeadlineQueue("event_start", self.dispatch_timed_events)
+        self.reminders = ReminderIndex(self.dispatch_reminders)
+        self.reminder_coalesce_window = ConfigManager.get_setting_default("reminder_coalesce_window", 180)
+        self.db_pool_warm_floor = ConfigManager.get_setting_default("db_pool_warm_floor", 5)
+        self.archive_after_days = ConfigManager.get_setting_default("archive_after_days", 30)
+        self.archive_batch_size = ConfigManager.get_setting_default("archive_batch_size", 200)
         self.server_status_url = ""
         self.server_status_dict: dict[str, list] = None
-        self.scheduler.register("notification_dispatcher", self.notification_dispatcher, dispatch_every=60, max_time=3)
+        # Reminders are sent by the reminder index, this is only a safety net for missed ones
+        self.scheduler.register("notification_dispatcher", self.notification_dispatcher, dispatch_every=600,
+                                max_time=3, init_delay=600)
         self.scheduler.register("server_status_scraper", self.scrape_for_server_status, dispatch_every=600, max_time=30)
         self.scheduler.register("mapping_cleanup", self.mapping_cleanup, dispatch_every=10)
+        self.scheduler.register("metrics_logger", self.log_metrics, dispatch_every=600, init_delay=600)
+        # asyncpg closes connections idle for 300 seconds, keep the warm floor connected
+        self.scheduler.register("db_keep_warm", self.keep_db_warm, dispatch_every=120, init_delay=120, max_time=5)
+        self.scheduler.register("event_archiver", self.archive_events, dispatch_every=3600, init_delay=1800,
+                                max_time=300, jitter=300)
         self.scheduler.register("msg_delete_dispatcher", self.msg_delete_dispatcher, dispatch_every=60)
-        self.scheduler.register("event_dispatcher", self.event_dispatcher, dispatch_every=60, max_time=5)
+        # Events are started by event_timers, this is only a safety net for missed ones
+        self.scheduler.register("event_dispatcher", self.event_dispatcher, dispatch_every=600, max_time=5,
+                                init_delay=600)
         self.scheduler.start()
 
     def get_lang(self, lang: str):
         pass
 
+    async def cog_load(self):
+        await self.load_event_timers()
+        await self.load_reminders()
+        self.event_timers.start()
+        self.reminders.start()
+
+    async def cog_unload(self):
+        self.event_timers.shutdown()
+        self.reminders.shutdown()
+        self.scheduler.shutdown()
+
+    async def load_event_timers(self):
+        with TimingContext("load_event_timers"):
+            upcoming = await Event.filter(state=EventStates.PLANING).values_list("id", "event_start")
+        for event_id, event_start in upcoming:
+            self.event_timers.set(event_id, event_start)
+        logger.info(f"Loaded {len(upcoming)} upcoming events into the event timer")
+
+    async def load_reminders(self):
+        with TimingContext("load_reminders"):
+            pending = await EventRegister.filter(
+                notified=False,
+                event__state=EventStates.PLANING
+            ).values_list("id", "event_id", "event__event_start", "notify_before")
+        for register_id, event_id, event_start, notify_before in pending:
+            self.reminders.add(register_id, event_id, event_start, notify_before)
+        logger.info(f"Loaded {len(pending)} pending reminders")
+
+    def track_event(self, event: Event):
+        """
+        Update the start timer of an event. Has to be called whenever an event is created,
+        its start time is changed or it is ended.
+        """
+        if event.state == EventStates.PLANING:
+            self.event_timers.set(event.id, event.event_start)
+            self.reminders.move_event(event.id, event.event_start)
+        else:
+            self.untrack_event(event)
+
+    def untrack_event(self, event: Event):
+        self.event_timers.discard(event.id)
+        self.reminders.remove_event(event.id)
+        EventEmbedCache.forget(event.id)
+        EventMetaCache.invalidate(event.message_id)
+
+    def track_registration(self, registration: EventRegister, event: Event):
+        """
+        Update the reminder of a registration. Has to be called whenever a registration is created
+        or its notify_before is changed.
+        """
+        if registration.notified:
+            self.reminders.remove(registration.id)
+            return
+        self.reminders.add(registration.id, event.id, event.event_start, registration.notify_before)
+
+    def untrack_registration(self, registration: EventRegister):
+        self.reminders.remove(registration.id)
+
+    async def log_metrics(self):
+        Metrics.log_summary()
+
+    async def keep_db_warm(self):
+        await PoolMonitor.keep_warm(self.db_pool_warm_floor)
+
+    async def archive_events(self):
+        """
+        Low priority retention job. Moves old ended events to the archive tables in small batches
+        with pauses in between, so it never holds many locks or competes with interactions.
+        """
+        before = time.time() - self.archive_after_days * 86400
+        archived = 0
+        while True:
+            moved = await Event.archive_ended(before, self.archive_batch_size)
+            archived += moved
+            if moved < self.archive_batch_size:
+                break
+            await asyncio.sleep(2)
+        if archived > 0:
+            Metrics.incr("events.archived", archived)
+            logger.info(f"Archived {archived} ended events")
+
     async def mapping_cleanup(self):
         copy = self.bot.interaction_income_mapping.copy()
         for k, v in copy.items():
@@ -45,53 +149,79 @@ class ScheduleManager(ExtCog):
 
     async def msg_delete_dispatcher(self):
         await self.bot.wait_until_ready()
-        msg_entries = await MessageDeleteQueue.filter(delete_at__lte=time.time())
-        logger.debug(f"Queried {len(msg_entries)} items to delete.")
+        msg_entries = await MessageDeleteQueue.claim_due(time.time())
+        logger.debug(f"Claimed {len(msg_entries)} items to delete.")
+        by_channel: dict[int, list[int]] = {}
         for saved_msg in msg_entries:
-            async def delete_msg(passed_msg):
-                msg_id = passed_msg.id
-                channel = self.bot.get_channel(passed_msg.channel_id)
-                try:
-                    m = await channel.fetch_message(msg_id)
-                    await m.delete()
-                except discord.HTTPException:
-                    pass
-                finally:
-                    await passed_msg.delete()
-
-            self.bot.loop.create_task(delete_msg(saved_msg))
+            by_channel.setdefault(saved_msg.channel_id, []).append(saved_msg.id)
+
+        async def delete_msgs(channel_id, message_ids):
+            try:
+                await self.bot.message_ops.bulk_delete(channel_id, message_ids)
+            except discord.HTTPException:
+                pass
+
+        await asyncio.gather(*[delete_msgs(k, v) for k, v in by_channel.items()])
 
     async def notification_dispatcher(self):
+        """
+        Reconciliation sweep for reminders the reminder index missed.
+        """
         await self.bot.wait_until_ready()
         with TimingContext("notification_db_access"):
-            lfgs: list[EventRegister] = await EventRegister.filter(
-                event__event_start__lte=time.time() + F("notify_before"),
-                event__state=EventStates.PLANING,
-                notified=False
-            )
-        logger.debug(f"Notify dispatcher queried {len(lfgs)} items")
+            lfgs = await EventRegister.claim_due_reminders(time.time(),
+                                                           coalesce_window=self.reminder_coalesce_window)
+        logger.debug(f"Notify dispatcher claimed {len(lfgs)} items")
         if len(lfgs) > 0:
-            logger.info(f"Notify dispatcher queried {len(lfgs)} items")
+            logger.warning(f"Notify dispatcher found {len(lfgs)} reminders the reminder index missed")
+        await self.send_reminders(lfgs)
+
+    async def dispatch_reminders(self, register_ids: list[int]):
+        await self.bot.wait_until_ready()
+        lfgs = await EventRegister.claim_due_reminders(time.time(), register_ids,
+                                                       coalesce_window=self.reminder_coalesce_window)
+        logger.debug(f"Reminder index fired for {len(register_ids)} items, claimed {len(lfgs)}")
+        await self.send_reminders(lfgs)
+
+    async def send_reminders(self, lfgs: list[EventRegister]):
+        if len(lfgs) == 0:
+            return
         for to_dispatch in lfgs:
-            async def dispatch(e: EventRegister):
-                try:
-                    await self.bot.event_manager.notify_start_user(e)
-                finally:
-                    e.notified = True
-                    await e.save()
-                    pass
-
-            # to_dispatch.last_dispatch = int(time.time())
-            # await to_dispatch.save()
-            asyncio.create_task(dispatch(to_dispatch))
+            # Reminders of the coalesce window are claimed early and must not fire again
+            self.reminders.remove(to_dispatch.id)
+        try:
+            await self.bot.event_manager.notify_start_users(lfgs)
+        except Exception as exc:
+            logger.error(f"Sending {len(lfgs)} reminders failed", exc_info=exc)
 
     async def event_dispatcher(self):
+        """
+        Reconciliation sweep. Dispatches events that were missed by the timer and
+        tracks events starting before the next sweep.
+        """
         await self.bot.wait_until_ready()
-        lfgs: list[Event] = await Event.filter(event_start__lte=time.time(),
-                                               state=EventStates.PLANING)
-        logger.debug(f"Event dispatcher queried {len(lfgs)} items")
-        if len(lfgs) > 0:
-            logger.info(f"Event dispatcher queried {len(lfgs)} items")
+        due = await Event.claim_due(time.time())
+        if len(due) > 0:
+            logger.warning(f"Event dispatcher found {len(due)} events the timer missed")
+        self.dispatch_events(due)
+        sweep_until = time.time() + self.scheduler.get("event_dispatcher").dispatch_every
+        upcoming = await Repository.fetch_upcoming_events(sweep_until)
+        logger.debug(f"Event dispatcher queried {len(upcoming)} upcoming items")
+        for event in upcoming:
+            if event.id not in self.event_timers:
+                logger.warning(f"Event {event.id} was not tracked by the event timer")
+                self.track_event(event)
+
+    async def dispatch_timed_events(self, event_ids: list[int]):
+        await self.bot.wait_until_ready()
+        lfgs = await Event.claim_due(time.time(), event_ids)
+        logger.debug(f"Event timer fired for {len(event_ids)} items, claimed {len(lfgs)}")
+        self.dispatch_events(lfgs)
+
+    def dispatch_events(self, lfgs: list[Event]):
+        """
+        Start already claimed events
+        """
         for to_dispatch in lfgs:
             async def dispatch(e: Event):
                 with TimingContext("dispatch_event", max_time=2):
@@ -100,8 +230,7 @@ class ScheduleManager(ExtCog):
                     finally:
                         pass
 
-            to_dispatch.state = EventStates.ENDED
-            await to_dispatch.save()
+            self.untrack_event(to_dispatch)
             asyncio.create_task(dispatch(to_dispatch))
 
     async def scrape_for_server_status(self):
@@ -149,20 +278,29 @@ class ScheduleManager(ExtCog):
 
 
 class Scheduler:
+    """
+    Deadline based scheduler.
+    Jobs are kept in a heap ordered by their next deadline (monotonic clock) and the main task
+    sleeps exactly until the earliest one is due instead of polling.
+    """
+
     class ScheduledTask:
-        def __init__(self, name, coro, dispatch_every, init_delay=0, ensure_completed=True, max_time=1):
+        def __init__(self, name, coro, dispatch_every=None, init_delay=0, ensure_completed=True, max_time=1,
+                     jitter=0):
             self.name = name
             self.is_canceled = False
             self.dispatch_every = dispatch_every
             self.coro = coro
             self.last_task: typing.Union[asyncio.Task, None] = None
-            self.util_dispatch = init_delay
             self.ensure_completed = ensure_completed
             self.max_time = max_time
+            self.jitter = jitter
+            self.base_deadline = time.monotonic() + init_delay
+            self.deadline = self.base_deadline
 
         @property
-        def can_run(self):
-            return self.util_dispatch <= 0
+        def periodic(self):
+            return self.dispatch_every is not None
 
         @property
         def is_finished(self):
@@ -170,16 +308,26 @@ class Scheduler:
                 return True
             return self.last_task.done()
 
-        def subtract(self, amount):
-            self.util_dispatch -= amount
+        def plan_next(self, now):
+            """
+            Calculate the next deadline based on the last planned one, so time spent in the loop does not drift
+            the schedule. Runs that were missed completely are skipped.
+            """
+            self.base_deadline += self.dispatch_every
+            if self.base_deadline <= now:
+                self.base_deadline = now + self.dispatch_every
+            self.deadline = self.base_deadline
+            if self.jitter:
+                self.deadline += random.uniform(0, self.jitter)
 
         def dispatch(self):
             logger.debug(f"Dispatching task '{self.name}'")
-            self.util_dispatch = self.dispatch_every
             start = time.perf_counter()
             self.last_task = asyncio.create_task(self.coro())
 
             def callback(t: Task):
+                if t.cancelled():
+                    return
                 if t.exception():
                     logger.error(f"Exception in {self.name}", exc_info=t.exception())
                 total_time = round(time.perf_counter() - start, 3)
@@ -190,32 +338,90 @@ class Scheduler:
             self.last_task.add_done_callback(callback)
 
     def __init__(self):
-        self.schedules: list[Scheduler.ScheduledTask] = []
+        self.schedules: dict[str, Scheduler.ScheduledTask] = {}
         self.task: asyncio.Task = None
-        self.delay = 5
-
-    def register(self, name, coro, dispatch_every, init_delay=0, ensure_completed=True, max_time=1):
+        self._heap: list[tuple[float, int, Scheduler.ScheduledTask]] = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def register(self, name, coro, dispatch_every, init_delay=0, ensure_completed=True, max_time=1, jitter=0):
+        """
+        Register a periodic job.
+        :param name: Unique name of the job. Registering the same name again replaces the old job.
+        :param coro: Coroutine function that is called on every run
+        :param dispatch_every: Interval in seconds
+        :param init_delay: Seconds until the first run
+        :param ensure_completed: Skip a run if the previous one is still going
+        :param max_time: Log a warning when a run takes longer than this
+        :param jitter: Add up to this many seconds of random delay to every run
+        :return:
+        """
         logger.info(f"Registered scheduled task '{name}' queued every {dispatch_every}")
-        scheduled = Scheduler.ScheduledTask(name, coro, dispatch_every, init_delay, ensure_completed, max_time)
-        self.schedules.append(scheduled)
+        scheduled = Scheduler.ScheduledTask(name, coro, dispatch_every, init_delay, ensure_completed, max_time,
+                                            jitter)
+        self._add(scheduled)
+        return scheduled
+
+    def schedule_once(self, name, coro, delay=0, max_time=1):
+        """
+        Register a job that only runs once after ``delay`` seconds.
+        """
+        logger.debug(f"Scheduled one shot task '{name}' in {delay} seconds")
+        scheduled = Scheduler.ScheduledTask(name, coro, init_delay=max(delay, 0), ensure_completed=False,
+                                            max_time=max_time)
+        self._add(scheduled)
+        return scheduled
+
+    def cancel(self, name):
+        """
+        Cancel a job. A run that is currently executing is not interrupted.
+        """
+        scheduled = self.schedules.pop(name, None)
+        if scheduled is None:
+            return False
+        scheduled.is_canceled = True
+        logger.debug(f"Canceled scheduled task '{name}'")
+        return True
 
     def get(self, name):
-        for i in self.schedules:
-            if i.name == name:
-                return i
-        else:
-            raise KeyError
+        return self.schedules[name]
+
+    def _add(self, scheduled: "Scheduler.ScheduledTask"):
+        self.cancel(scheduled.name)
+        self.schedules[scheduled.name] = scheduled
+        self._push(scheduled)
+
+    def _push(self, scheduled: "Scheduler.ScheduledTask"):
+        heapq.heappush(self._heap, (scheduled.deadline, next(self._counter), scheduled))
+        if self._heap[0][2] is scheduled:
+            # New earliest deadline, let the main task recalculate its sleep time
+            self._wakeup.set()
+
+    def _run_due(self, now):
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, scheduled = heapq.heappop(self._heap)
+            if scheduled.is_canceled or scheduled.deadline != deadline:
+                continue  # Stale heap entry
+            if scheduled.ensure_completed and not scheduled.is_finished:
+                logger.debug(f"Skipping task '{scheduled.name}' because the previous run is still going")
+            else:
+                scheduled.dispatch()
+            if scheduled.periodic:
+                scheduled.plan_next(now)
+                heapq.heappush(self._heap, (scheduled.deadline, next(self._counter), scheduled))
+            else:
+                self.schedules.pop(scheduled.name, None)
 
     async def __start_scheduling(self):
         logger.info("Started main scheduler task")
         while True:
-            await asyncio.sleep(self.delay)
-            for i in self.schedules:
-                i.subtract(self.delay)
-                if i.can_run:
-                    if i.ensure_completed and not i.is_finished:
-                        continue
-                    i.dispatch()
+            self._run_due(time.monotonic())
+            self._wakeup.clear()
+            timeout = max(self._heap[0][0] - time.monotonic(), 0) if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
 
     def start(self):
         loop = asyncio.get_event_loop_policy().get_event_loop()
@@ -224,7 +430,7 @@ class Scheduler:
     def shutdown(self):
         self.task.cancel()
         currently_running = []
-        for i in self.schedules:
+        for i in self.schedules.values():
             if not i.is_finished:
                 currently_running.append(i.last_task)
         for to_kill in currently_running:
@@ -30,6 +30,7 @@ class ServerManagement(ExtCog):
         lang = self.get_lang(server.lang).manager_role
         server.manager_role = role.id if role else None
         await server.save()
+        Server.cache_settings(server)
         embed = BetterEmbed(BetterEmbed.OK)
         embed.set_default_thumbnail()
         embed.set_header(lang.title.get_string())
@@ -56,6 +57,7 @@ class ServerManagement(ExtCog):
         seconds = (offset * 3600) * - 1
         server.time_offset = seconds
         await server.save(update_fields=("time_offset",))
+        Server.cache_settings(server)
         embed = BetterEmbed(BetterEmbed.OK)
         embed.set_default_thumbnail()
         embed.set_header(lang.title_acive.get_string())
@@ -86,6 +88,7 @@ class ServerManagement(ExtCog):
         embed.description = lang.desc_fin.get_string()
         server.delete_delay = index
         await server.save()
+        Server.cache_settings(server)
         await interaction.response.edit_message(view=None, embed=embed)
 
     @group.command(description="Add a log channel.")
@@ -99,6 +102,7 @@ class ServerManagement(ExtCog):
         embed.footer_from_interaction(interaction)
         server.log_channel = channel.id
         await server.save()
+        Server.cache_settings(server)
         await interaction.response.send_message(embed=embed)
 
 
@@ -3,12 +3,12 @@ from typing import Optional
 
 import aiohttp
 from locales.gen import LanguageSchema
-from tortoise import connections as tortoise_connections
 
 from bot import Neria
-from persistence.models import Users
+from persistence.repository import Repository
 from utils.config_manager import ConfigManager
 from utils.media_manager import MediaManager
+from utils.metrics import Metrics
 from utils.overwrites import ExtCog
 from utils.static import StaticIdMaps
 
@@ -22,6 +22,8 @@ class StatManagement(ExtCog):
         self.stats = BotStats()
         if not self.bot.is_debug():
             self.bot.scheduler.scheduler.register("stat_grabber", self.fetch_stats, 600)
+            self.bot.scheduler.scheduler.register("stat_reconciler", self.reconcile_stats, 86400, init_delay=3600,
+                                                  max_time=30, jitter=600)
         if ConfigManager.get_setting("top_gg"):
             self.bot.scheduler.scheduler.register("top_gg_updater", self.top_gg_poster, 3600)
 
@@ -43,23 +45,24 @@ class StatManagement(ExtCog):
     async def fetch_stats(self):
         await self.bot.wait_until_ready()
         self.stats.guild_count = len(self.bot.guilds)
-        #  Use manual SQL because is easier than using the ORM for this task
-        result = await (tortoise_connections.get("main")
-                        .execute_query
-                        ("""SELECT class_type, count(*) AS count FROM playercharacter 
-                                        GROUP BY class_type ORDER BY count DESC"""))
-        rows = result[1]
         labels = []
         dataset_values = []
-        for row in rows:
-            labels.append(StaticIdMaps.PLAYER_CLASSES[row.get("class_type")].name)
-            dataset_values.append((MediaManager.get_color_from_map(row.get("class_type")), row.get("count")))
+        class_counts, user_count = await Repository.fetch_stat_counters()
+        for class_type, count in class_counts:
+            labels.append(StaticIdMaps.PLAYER_CLASSES[class_type].name)
+            dataset_values.append((MediaManager.get_color_from_map(class_type), count))
         self.stats.character_labels = labels
         self.stats.character_count = dataset_values
         self.stats.total_characters = sum(i[1] for i in dataset_values)
-        self.stats.user_count = await Users.all().count()
+        self.stats.user_count = user_count
         await self.stats.update_chart()
 
+    async def reconcile_stats(self):
+        drifted = await Repository.reconcile_stat_counters()
+        Metrics.incr("stats.counter_drift", len(drifted))
+        for kind, key, count in drifted:
+            logger.warning(f"Stat counter {kind}:{key} had drifted, reset to {count}")
+
 
 class BotStats:
     def __init__(self):
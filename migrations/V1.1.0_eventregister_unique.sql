@@ -0,0 +1,11 @@
+-- depends: V1.0.0_baseline
+
+-- Keep the oldest registration of users that got registered twice
+DELETE FROM public.eventregister a
+    USING public.eventregister b
+WHERE a.event_id = b.event_id
+  AND a.user_id = b.user_id
+  AND a.id > b.id;
+
+ALTER TABLE ONLY public.eventregister
+    ADD CONSTRAINT eventregister_event_id_user_id_key UNIQUE (event_id, user_id);
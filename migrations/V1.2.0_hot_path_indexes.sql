@@ -0,0 +1,19 @@
+-- depends: V1.1.0_eventregister_unique
+
+-- Dispatchers: state = PLANING AND event_start <= now
+CREATE INDEX IF NOT EXISTS event_state_event_start_idx
+    ON public.event USING btree (state, event_start);
+
+-- Register flow looks up (event_id, user_id), served by eventregister_event_id_user_id_key from V1.1.0
+
+-- Reminder sweeps only ever look at registrations that were not notified yet
+CREATE INDEX IF NOT EXISTS eventregister_event_id_not_notified_idx
+    ON public.eventregister USING btree (event_id) WHERE notified = false;
+
+-- Reminder coalescing and /profile look up registrations per user
+CREATE INDEX IF NOT EXISTS eventregister_user_id_idx
+    ON public.eventregister USING btree (user_id);
+
+-- Delete queue sweep: delete_at <= now
+CREATE INDEX IF NOT EXISTS messagedeletequeue_delete_at_idx
+    ON public.messagedeletequeue USING btree (delete_at);
@@ -0,0 +1,40 @@
+-- depends: V1.2.0_hot_path_indexes
+
+-- Cold storage for ended events, filled in batches by the event_archiver job.
+-- Columns mirror the hot tables, new columns there have to be added here as well.
+CREATE TABLE public.event_archive (
+    LIKE public.event INCLUDING DEFAULTS,
+    archived_at bigint NOT NULL DEFAULT extract(epoch FROM now())::bigint,
+    CONSTRAINT event_archive_pkey PRIMARY KEY (id)
+);
+
+CREATE TABLE public.eventregister_archive (
+    LIKE public.eventregister INCLUDING DEFAULTS,
+    CONSTRAINT eventregister_archive_pkey PRIMARY KEY (id)
+);
+
+-- LIKE copies the nextval defaults of the id columns, archived rows always keep their original id
+ALTER TABLE public.event_archive ALTER COLUMN id DROP DEFAULT;
+ALTER TABLE public.eventregister_archive ALTER COLUMN id DROP DEFAULT;
+
+CREATE INDEX eventregister_archive_user_id_idx
+    ON public.eventregister_archive USING btree (user_id);
+CREATE INDEX eventregister_archive_event_id_idx
+    ON public.eventregister_archive USING btree (event_id);
+
+-- Full history across hot and archived rows
+CREATE VIEW public.event_history AS
+    SELECT id, event_start, channel_id, message_id, description, title, max_players, weekly, last_dispatch,
+           guild_event_id, creator_id, server_id, advanced_settings, state
+    FROM public.event
+    UNION ALL
+    SELECT id, event_start, channel_id, message_id, description, title, max_players, weekly, last_dispatch,
+           guild_event_id, creator_id, server_id, advanced_settings, state
+    FROM public.event_archive;
+
+CREATE VIEW public.eventregister_history AS
+    SELECT id, substitute, registered_at, character_id, event_id, user_id, notified, notify_before
+    FROM public.eventregister
+    UNION ALL
+    SELECT id, substitute, registered_at, character_id, event_id, user_id, notified, notify_before
+    FROM public.eventregister_archive;
@@ -0,0 +1,61 @@
+-- depends: V1.3.0_event_archive
+
+-- Precomputed counts for /bot_info and the character chart, kept up to date by triggers.
+-- kind 'users' uses key 0, kind 'class' uses the class_type as key.
+CREATE TABLE public.stat_counter (
+    kind text NOT NULL,
+    key integer NOT NULL,
+    count bigint NOT NULL DEFAULT 0,
+    CONSTRAINT stat_counter_pkey PRIMARY KEY (kind, key)
+);
+
+CREATE FUNCTION public.stat_counter_add(p_kind text, p_key integer, p_amount bigint) RETURNS void
+    LANGUAGE sql AS $$
+    INSERT INTO public.stat_counter (kind, key, count) VALUES (p_kind, p_key, p_amount)
+    ON CONFLICT (kind, key) DO UPDATE SET count = public.stat_counter.count + EXCLUDED.count;
+$$;
+
+CREATE FUNCTION public.stat_counter_users() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM public.stat_counter_add('users', 0, 1);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM public.stat_counter_add('users', 0, -1);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE FUNCTION public.stat_counter_characters() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        PERFORM public.stat_counter_add('class', OLD.class_type, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM public.stat_counter_add('class', NEW.class_type, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER stat_counter_users
+    AFTER INSERT OR DELETE ON public.users
+    FOR EACH ROW EXECUTE FUNCTION public.stat_counter_users();
+
+-- Also fires for characters deleted by the cascade of a deleted user
+CREATE TRIGGER stat_counter_characters
+    AFTER INSERT OR DELETE ON public.playercharacter
+    FOR EACH ROW EXECUTE FUNCTION public.stat_counter_characters();
+
+CREATE TRIGGER stat_counter_characters_class
+    AFTER UPDATE OF class_type ON public.playercharacter
+    FOR EACH ROW
+    WHEN (OLD.class_type IS DISTINCT FROM NEW.class_type)
+    EXECUTE FUNCTION public.stat_counter_characters();
+
+INSERT INTO public.stat_counter (kind, key, count)
+    SELECT 'users', 0, count(*) FROM public.users;
+INSERT INTO public.stat_counter (kind, key, count)
+    SELECT 'class', class_type, count(*) FROM public.playercharacter GROUP BY class_type;
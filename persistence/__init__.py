@@ -1,3 +1,7 @@
 class EventStates:
     PLANING = 0
     ENDED = 1
+
+    @staticmethod
+    def has_ended(state: int) -> bool:
+        return state == EventStates.ENDED
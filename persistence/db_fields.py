@@ -1,27 +1,85 @@
+from collections import OrderedDict
 from typing import Optional
 from typing import Any, Union, Type
 
 
+from pydantic import TypeAdapter
 from tortoise.fields import JSONField
 from .pydantic_models import AdvancedOptions
 from tortoise import Model
 
 
+class _RawJSON:
+    """
+    Undecoded database value, decoded by :class:`PydanticDBField` on first attribute access
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, data: Union[str, bytes]):
+        self.data = data
+
+
 class PydanticDBField(JSONField):
+    """
+    JSON field holding an :class:`AdvancedOptions`.
+    Values loaded from the database are only decoded when the attribute is accessed. Decoding validates
+    the raw JSON with pydantic's own parser and identical payloads share one (frozen) instance.
+    Results of ``.values()`` queries are not decoded, use :meth:`decode` on them.
+    """
+    ADAPTER = TypeAdapter(AdvancedOptions)
+    DECODED_CACHE_SIZE = 1024
+    DECODED: OrderedDict[Union[str, bytes], AdvancedOptions] = OrderedDict()
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        self.attribute_name = None
+
+    def __set_name__(self, owner, name):
+        self.attribute_name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = instance.__dict__.get(self.attribute_name)
+        if isinstance(value, _RawJSON):
+            value = self.load(value)
+            instance.__dict__[self.attribute_name] = value
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.attribute_name] = value
+
+    @classmethod
+    def decode(cls, value: Union[str, bytes, _RawJSON]) -> AdvancedOptions:
+        if isinstance(value, _RawJSON):
+            value = value.data
+        decoded = cls.DECODED.get(value)
+        if decoded is not None:
+            cls.DECODED.move_to_end(value)
+            return decoded
+        decoded = cls.ADAPTER.validate_json(value)
+        cls.DECODED[value] = decoded
+        if len(cls.DECODED) > cls.DECODED_CACHE_SIZE:
+            cls.DECODED.popitem(last=False)
+        return decoded
+
+    @classmethod
+    def load(cls, value: Optional[Union[str, bytes, dict, _RawJSON, AdvancedOptions]]) -> Optional[AdvancedOptions]:
+        """
+        Decode a raw database value, also used by the records of :mod:`persistence.repository`
+        """
+        if value is None or isinstance(value, AdvancedOptions):
+            return value
+        if isinstance(value, (str, bytes, _RawJSON)):
+            return cls.decode(value)
+        return cls.ADAPTER.validate_python(value)
 
     def to_db_value(self, value: "AdvancedOptions", instance: "Union[Type[Model], Model]") -> "Any":
         return super().to_db_value(value.dict() if value else None, instance)
 
     def to_python_value(
         self, value: Optional[Union[str, bytes, dict, list]]
-    ) -> Optional[AdvancedOptions]:
-        data = super().to_python_value(value)
-        if data is None:
-            return None
-        if not isinstance(data, AdvancedOptions):
-            return AdvancedOptions(**data)
-        return value
-
-
+    ) -> Optional[Union[AdvancedOptions, _RawJSON]]:
+        if isinstance(value, (str, bytes)):
+            return _RawJSON(value)
+        return self.load(value)
@@ -1,11 +1,17 @@
+from collections import OrderedDict
+from typing import Optional, Type
+
+from tortoise import connections
 from tortoise.exceptions import DoesNotExist
 from tortoise.models import Model
+from tortoise.transactions import in_transaction
 from tortoise import fields
 from tortoise.fields import data
 
 from persistence import EventStates
 from persistence.db_fields import PydanticDBField
 from persistence.pydantic_models import AdvancedOptions
+from utils.metrics import Metrics
 from utils.static import PlayerClass, StaticIdMaps
 
 
@@ -54,7 +60,55 @@ class Event(EvenDatatMeta, Model):
 
     @property
     def has_ended(self):
-        return self.state is EventStates.ENDED
+        return EventStates.has_ended(self.state)
+
+    @classmethod
+    async def claim_due(cls, now: int, ids: Optional[list[int]] = None) -> list["Event"]:
+        """
+        Mark all due events as ended and return them in one statement.
+        Rows are only returned to the caller that flipped the state, so events can't be dispatched twice.
+        :param now: Timestamp events have to start before
+        :param ids: Only claim these events
+        :return:
+        """
+        sql = "UPDATE event SET state = $1 WHERE state = $2 AND event_start <= $3"
+        values = [EventStates.ENDED, EventStates.PLANING, int(now)]
+        if ids is not None:
+            sql += " AND id = ANY($4::int[])"
+            values.append(ids)
+        rows = await connections.get("main").execute_query_dict(sql + " RETURNING *", values)
+        return [cls._init_from_db(**row) for row in rows]
+
+    @classmethod
+    async def archive_ended(cls, before: int, batch_size: int) -> int:
+        """
+        Move one batch of ended events that started before ``before`` together with their registrations
+        into the archive tables.
+        :return: Amount of archived events
+        """
+        async with in_transaction("main") as connection:
+            rows = await connection.execute_query_dict(
+                """SELECT id FROM event WHERE state = $1 AND event_start < $2
+                   ORDER BY event_start LIMIT $3 FOR UPDATE SKIP LOCKED""",
+                [EventStates.ENDED, int(before), batch_size])
+            ids = [row["id"] for row in rows]
+            if len(ids) == 0:
+                return 0
+            await connection.execute_query_dict(
+                """WITH moved AS (DELETE FROM eventregister WHERE event_id = ANY($1::int[]) RETURNING *)
+                   INSERT INTO eventregister_archive (id, substitute, registered_at, character_id, event_id,
+                                                      user_id, notified, notify_before)
+                   SELECT id, substitute, registered_at, character_id, event_id, user_id, notified, notify_before
+                   FROM moved""", [ids])
+            await connection.execute_query_dict(
+                """WITH moved AS (DELETE FROM event WHERE id = ANY($1::int[]) RETURNING *)
+                   INSERT INTO event_archive (id, event_start, channel_id, message_id, description, title,
+                                              max_players, weekly, last_dispatch, guild_event_id, creator_id,
+                                              server_id, advanced_settings, state)
+                   SELECT id, event_start, channel_id, message_id, description, title, max_players, weekly,
+                          last_dispatch, guild_event_id, creator_id, server_id, advanced_settings, state
+                   FROM moved""", [ids])
+            return len(ids)
 
 
 class EventRegister(Model):
@@ -66,9 +120,39 @@ class EventRegister(Model):
     notified: bool = fields.BooleanField(default=False, null=False)
     notify_before: int = fields.IntField(null=False, default=300)
 
+    class Meta:
+        unique_together = (("event", "user"),)
+
     async def fetch_character(self):
         await self.fetch_related("character")
 
+    @classmethod
+    async def claim_due_reminders(cls, now: int, ids: Optional[list[int]] = None,
+                                  coalesce_window: int = 0) -> list["EventRegister"]:
+        """
+        Mark all registrations whose reminder is due as notified and return them in one statement.
+        :param now: Current timestamp
+        :param ids: Only claim these registrations
+        :param coalesce_window: Also claim reminders of the same users that are due within this many seconds
+        :return:
+        """
+        due_filter = ""
+        values = [EventStates.PLANING, int(now), int(now) + coalesce_window]
+        if ids is not None:
+            due_filter = "AND r.id = ANY($4::int[])"
+            values.append(ids)
+        sql = f"""WITH due AS (
+                     SELECT r.id, r.user_id FROM eventregister AS r JOIN event AS e ON r.event_id = e.id
+                     WHERE e.state = $1 AND r.notified = FALSE AND e.event_start - r.notify_before <= $2 {due_filter}
+                 )
+                 UPDATE eventregister AS r SET notified = TRUE FROM event AS e
+                 WHERE r.event_id = e.id AND e.state = $1 AND r.notified = FALSE
+                 AND (r.id IN (SELECT id FROM due)
+                      OR (r.user_id IN (SELECT user_id FROM due) AND e.event_start - r.notify_before <= $3))
+                 RETURNING r.*"""
+        rows = await connections.get("main").execute_query_dict(sql, values)
+        return [cls._init_from_db(**row) for row in rows]
+
 
 class PlayerCharacter(Model):
     id: int
@@ -87,6 +171,40 @@ class PlayerCharacter(Model):
         return self.id == self.user.main_class
 
 
+async def _get_or_insert(model: Type[Model], known_ids: set[int], i: int, **values):
+    """
+    Get a row by id and create it if it does not exist yet.
+    Ids seen before are only read. New ids are inserted with ON CONFLICT DO NOTHING,
+    which returns the existing row in the same statement, so concurrent first calls can't fail.
+    :param values: Columns to set on insert besides the id
+    """
+    if i in known_ids:
+        try:
+            return await model.get(id=i)
+        except DoesNotExist:
+            known_ids.discard(i)
+    columns = ["id", *values.keys()]
+    returning = ", ".join(model._meta.db_fields)
+    placeholders = ", ".join(f"${n}" for n in range(1, len(columns) + 1))
+    table = model._meta.db_table
+    sql = f"""WITH inserted AS (
+                  INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders})
+                  ON CONFLICT (id) DO NOTHING RETURNING {returning}
+              )
+              SELECT {returning} FROM inserted
+              UNION ALL
+              SELECT {returning} FROM {table} WHERE id = $1
+              LIMIT 1"""
+    rows = await connections.get("main").execute_query_dict(sql, [i, *values.values()])
+    if len(rows) == 0:
+        # Row was inserted by a concurrent transaction that committed after our snapshot
+        ret = await model.get(id=i)
+    else:
+        ret = model._init_from_db(**rows[0])
+    known_ids.add(i)
+    return ret
+
+
 class Users(Model):
     id = fields.BigIntField(pk=True)
     created_events = fields.ReverseRelation["Event"]
@@ -102,13 +220,11 @@ class Users(Model):
     async def fetch_registered_events(self):
         await self.fetch_related("registered_for__event")
 
+    KNOWN_IDS: set[int] = set()
+
     @classmethod
     async def get_safe(cls, i):
-        try:
-            ret = await cls.get(id=i)
-        except DoesNotExist:
-            ret = await cls.create(id=i)
-        return ret
+        return await _get_or_insert(cls, cls.KNOWN_IDS, i)
 
     def get_primary(self):
         for i in self.characters:
@@ -133,13 +249,39 @@ class Server(Model):
             return 0
         return int((self.time_offset / 3600) * -1)  # Revert Hours
 
+    KNOWN_IDS: set[int] = set()
+    SETTINGS_CACHE_SIZE = 5000
+    SETTINGS_CACHE: OrderedDict[int, dict] = OrderedDict()  # id -> column values
+
     @classmethod
     async def get_safe(cls, i):
-        try:
-            ret = await cls.get(id=i)
-        except DoesNotExist:
-            ret = await cls.create(id=i)
-        return ret
+        """
+        Served from the guild settings cache. Every change to a server has to be written
+        through with :meth:`cache_settings`.
+        Each call returns a new instance, so callers are free to modify it.
+        """
+        row = cls.SETTINGS_CACHE.get(i)
+        if row is not None:
+            cls.SETTINGS_CACHE.move_to_end(i)
+            Metrics.incr("guild_settings_cache.hit")
+            return cls._init_from_db(**row)
+        Metrics.incr("guild_settings_cache.miss")
+        # lang has no default in the database
+        server = await _get_or_insert(cls, cls.KNOWN_IDS, i, lang="en")
+        cls.cache_settings(server)
+        return server
+
+    @classmethod
+    def cache_settings(cls, server: "Server"):
+        cls.SETTINGS_CACHE[server.id] = {column: getattr(server, field)
+                                         for field, column in cls._meta.fields_db_projection.items()}
+        cls.SETTINGS_CACHE.move_to_end(server.id)
+        if len(cls.SETTINGS_CACHE) > cls.SETTINGS_CACHE_SIZE:
+            cls.SETTINGS_CACHE.popitem(last=False)
+
+    @classmethod
+    def invalidate_settings(cls, i):
+        cls.SETTINGS_CACHE.pop(i, None)
 
     async def fetch_event_presets(self):
         await self.fetch_related("event_presets")
@@ -166,3 +308,12 @@ class MessageDeleteQueue(Model):
     id: int = fields.BigIntField(null=False, pk=True)
     delete_at = fields.BigIntField(null=False)
     channel_id = fields.BigIntField(null=False)
+
+    @classmethod
+    async def claim_due(cls, now: int) -> list["MessageDeleteQueue"]:
+        """
+        Remove all due entries from the queue and return them in one statement
+        """
+        rows = await connections.get("main").execute_query_dict(
+            "DELETE FROM messagedeletequeue WHERE delete_at <= $1 RETURNING *", [int(now)])
+        return [cls._init_from_db(**row) for row in rows]
@@ -1,9 +1,12 @@
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class AdvancedOptions(BaseModel):
+    # Instances are shared between rows with identical settings, changes go through copy(update=...)
+    model_config = ConfigDict(frozen=True)
+
     min_gear_score: Optional[int] = None
     max_same_class: Optional[int] = None
     min_supporters: Optional[int] = 0
@@ -0,0 +1,136 @@
+import datetime
+import time
+from typing import Optional
+
+import discord
+import pytz
+from tortoise.exceptions import IntegrityError
+from tortoise.transactions import in_transaction
+
+from errors import registration
+from errors.basic import EventNotFound
+from persistence.models import Event, EventRegister, PlayerCharacter
+from persistence.roster import Roster
+
+
+class RegistrationService:
+    """
+    Registers users for events. Every write locks the event row and checks capacity and requirements again
+    on the locked roster, so concurrent clicks can't overfill an event or register a user twice.
+    """
+
+    @classmethod
+    def can_register(cls, user: discord.Member, event: Event):
+        if event.advanced_settings is None:
+            return
+        role_ids = event.advanced_settings.prio_roles
+        prio_roles = []
+        for i in role_ids:
+            role = user.guild.get_role(i)
+            if role:
+                prio_roles.append(role)
+
+        if len(prio_roles) == 0:
+            return
+
+        seconds_ignore = event.advanced_settings.prio_time * 60
+        now = datetime.datetime.now(tz=pytz.UTC).timestamp()
+        starts_in = event.event_start - now
+        if (starts_in - seconds_ignore) < 0:
+            return
+        for role in prio_roles:
+            if role in user.roles:
+                return
+        raise registration.NoPrioRoleError(prio_roles, event.event_start - seconds_ignore)
+
+    @classmethod
+    def filter_register_characters(cls, roster: Roster, character_list: list[PlayerCharacter]):
+        """
+        Filter the users selection based of the advanced settings
+        :param character_list:
+        :param roster:
+        :return:
+        """
+        event = roster.event
+        summary = roster.summary
+        space_left = event.max_players - summary.main_count
+        if space_left <= 0:
+            raise registration.PlayersFullError(event.max_players)
+
+        settings = event.advanced_settings
+        if settings is None:
+            return list(character_list)
+
+        supports_required = settings.min_supporters - summary.support_count
+        supports_only = space_left <= supports_required
+        filtered_list = []
+        for character in character_list:
+            character_class = character.character_class
+            if settings.max_same_class is not None and \
+                    summary.class_counts[character_class.class_id] >= settings.max_same_class:
+                continue
+            if settings.min_gear_score is not None and not character.item_lvl >= settings.min_gear_score:
+                continue
+            if supports_only and not character_class.has_tag("support"):
+                continue
+            filtered_list.append(character)
+
+        if len(filtered_list) == 0:
+            raise registration.RequirementsNotMetError
+
+        return filtered_list
+
+    @classmethod
+    async def _lock_roster(cls, event: Event, connection) -> Roster:
+        roster = await Roster.load(event.id, connection=connection, lock=True)
+        if roster is None or roster.event.has_ended:
+            raise EventNotFound(event.message_id)
+        return roster
+
+    @classmethod
+    async def register(cls, event: Event, member: discord.Member, character: PlayerCharacter,
+                       substitute: bool) -> Optional[EventRegister]:
+        """
+        Register a user with the selected character.
+        :return: The new registration or None if the user is already registered
+        """
+        try:
+            async with in_transaction("main") as connection:
+                roster = await cls._lock_roster(event, connection)
+                if roster.get_registration(member.id) is not None:
+                    return None
+                if not substitute:
+                    cls.can_register(member, roster.event)
+                    cls.filter_register_characters(roster, [character])
+                registration_event = await EventRegister.create(
+                    event=roster.event,
+                    user_id=member.id,
+                    character=character,
+                    registered_at=int(time.time()),
+                    substitute=substitute,
+                    using_db=connection
+                )
+                roster.add_registration(registration_event)
+                return registration_event
+        except IntegrityError:
+            # Unique (event_id, user_id) constraint, the user registered in parallel
+            return None
+
+    @classmethod
+    async def switch_side(cls, event: Event, member: discord.Member, substitute: bool) -> bool:
+        """
+        Move a registered user between the main and the substitute list.
+        :return: False if there was nothing to switch
+        """
+        async with in_transaction("main") as connection:
+            roster = await cls._lock_roster(event, connection)
+            registration_event = roster.get_registration(member.id)
+            if registration_event is None or registration_event.substitute == substitute:
+                return False
+            if not substitute:
+                cls.can_register(member, roster.event)
+                cls.filter_register_characters(roster, [registration_event.character])
+            roster.set_substitute(registration_event, substitute)
+            registration_event.registered_at = int(time.time())
+            await registration_event.save(update_fields=["substitute", "registered_at"], using_db=connection)
+            return True
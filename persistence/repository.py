@@ -0,0 +1,231 @@
+from typing import Optional, Union
+
+from tortoise import connections
+from tortoise.transactions import in_transaction
+
+from persistence import EventStates
+from persistence.db_fields import PydanticDBField
+from persistence.pydantic_models import AdvancedOptions
+from persistence.roster import RegistrationLookup, Roster, RosterSummary
+from utils.metrics import Metrics
+from utils.static import PlayerClass, StaticIdMaps
+
+
+class CharacterRecord:
+    __slots__ = ("id", "class_type", "character_name", "item_lvl", "user_id", "api_id")
+
+    def __init__(self, id, class_type, character_name, item_lvl, user_id, api_id):
+        self.id = id
+        self.class_type = class_type
+        self.character_name = character_name
+        self.item_lvl = item_lvl
+        self.user_id = user_id
+        self.api_id = api_id
+
+    @property
+    def character_class(self) -> PlayerClass:
+        return StaticIdMaps.PLAYER_CLASSES[self.class_type]
+
+
+class RegistrationRecord:
+    __slots__ = ("id", "user_id", "substitute", "registered_at", "notify_before", "character")
+
+    def __init__(self, id, user_id, substitute, registered_at, notify_before, character: CharacterRecord):
+        self.id = id
+        self.user_id = user_id
+        self.substitute = substitute
+        self.registered_at = registered_at
+        self.notify_before = notify_before
+        self.character = character
+
+
+class ServerRecord:
+    __slots__ = ("id", "lang")
+
+    def __init__(self, id, lang):
+        self.id = id
+        self.lang = lang
+
+
+class EventRecord:
+    __slots__ = ("id", "title", "description", "max_players", "event_start", "channel_id", "message_id", "state",
+                 "creator_id", "server_id", "_advanced_settings")
+
+    def __init__(self, id, title, description, max_players, event_start, channel_id, message_id, state,
+                 creator_id, server_id, advanced_settings):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.max_players = max_players
+        self.event_start = event_start
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.state = state
+        self.creator_id = creator_id
+        self.server_id = server_id
+        self._advanced_settings = advanced_settings
+
+    @property
+    def advanced_settings(self) -> Optional[AdvancedOptions]:
+        self._advanced_settings = PydanticDBField.load(self._advanced_settings)
+        return self._advanced_settings
+
+    @property
+    def has_ended(self):
+        return EventStates.has_ended(self.state)
+
+
+class EventTimerRecord:
+    __slots__ = ("id", "event_start", "state", "message_id")
+
+    def __init__(self, id, event_start, state, message_id):
+        self.id = id
+        self.event_start = event_start
+        self.state = state
+        self.message_id = message_id
+
+
+class ProfileEventRecord:
+    __slots__ = ("title", "event_start", "channel_id", "message_id")
+
+    def __init__(self, title, event_start, channel_id, message_id):
+        self.title = title
+        self.event_start = event_start
+        self.channel_id = channel_id
+        self.message_id = message_id
+
+
+class RosterRecord(RegistrationLookup):
+    """
+    Read only counterpart of :class:`persistence.roster.Roster` for rendering
+    """
+    __slots__ = ("event", "server", "registrations", "summary")
+
+    def __init__(self, event: EventRecord, server: ServerRecord, registrations: list[RegistrationRecord]):
+        self.event = event
+        self.server = server
+        self.registrations = registrations
+        self.summary = RosterSummary.from_registrations(registrations)
+
+
+class Repository:
+    """
+    Hand written queries for read heavy paths. They run on the tortoise connection pool and
+    return lightweight records instead of model instances.
+    asyncpg prepares every statement once per connection and reuses it from its statement cache.
+    """
+    PRESET_NAMES = "SELECT name FROM eventpreset WHERE server_id = $1 ORDER BY name"
+    CHARACTERS = """SELECT id, class_type, character_name, item_lvl, user_id, api_id
+                    FROM playercharacter WHERE user_id = $1 ORDER BY id"""
+    PROFILE_EVENTS = """SELECT e.title, e.event_start, e.channel_id, e.message_id
+                        FROM eventregister AS r JOIN event AS e ON e.id = r.event_id
+                        WHERE r.user_id = $1 AND e.state = $2
+                        ORDER BY r.id"""
+    UPCOMING_EVENTS = """SELECT id, event_start, state, message_id FROM event
+                         WHERE state = $1 AND event_start <= $2"""
+    STAT_COUNTERS = "SELECT kind, key, count FROM stat_counter WHERE count > 0 ORDER BY count DESC"
+    # Recounts the trigger maintained counters, classes without characters are set to 0
+    RECONCILE_STAT_COUNTERS = """
+        WITH actual AS (
+            SELECT 'users' AS kind, 0 AS key, count(*) AS count FROM users
+            UNION ALL
+            SELECT 'class', class_type, count(*) FROM playercharacter GROUP BY class_type
+            UNION ALL
+            SELECT kind, key, 0 FROM stat_counter
+            WHERE kind = 'class' AND key NOT IN (SELECT class_type FROM playercharacter)
+        )
+        INSERT INTO stat_counter (kind, key, count) SELECT kind, key, count FROM actual
+        ON CONFLICT (kind, key) DO UPDATE SET count = EXCLUDED.count
+        WHERE stat_counter.count IS DISTINCT FROM EXCLUDED.count
+        RETURNING kind, key, count"""
+
+    @classmethod
+    def statements(cls) -> dict[str, tuple[str, tuple]]:
+        """
+        :return: name -> (sql, arguments matching no rows), used to prepare the statements on warmup
+        """
+        return {
+            "roster": (cls.roster_sql(), (-1,)),
+            "preset_names": (cls.PRESET_NAMES, (-1,)),
+            "characters": (cls.CHARACTERS, (-1,)),
+            "profile_events": (cls.PROFILE_EVENTS, (-1, EventStates.PLANING)),
+            "upcoming_events": (cls.UPCOMING_EVENTS, (EventStates.PLANING, -1)),
+            "stat_counters": (cls.STAT_COUNTERS, ()),
+        }
+
+    @classmethod
+    def roster_sql(cls) -> str:
+        """
+        Same statement as :meth:`Roster.load`, so both paths share one prepared statement
+        """
+        return Roster._get_sql().format("id")
+
+    @classmethod
+    async def _fetch(cls, name: str, sql: str, *args) -> list:
+        async with connections.get("main").acquire_connection() as connection:
+            with Metrics.timed(f"repository.{name}"):
+                return await connection.fetch(sql, *args)
+
+    @classmethod
+    async def fetch_roster(cls, event_id: int) -> Optional[RosterRecord]:
+        rows = await cls._fetch("roster", cls.roster_sql(), event_id)
+        if len(rows) == 0:
+            return None
+        first = rows[0]
+        event = EventRecord(first["e__id"], first["e__title"], first["e__description"], first["e__max_players"],
+                            first["e__event_start"], first["e__channel_id"], first["e__message_id"],
+                            first["e__state"], first["e__creator_id"], first["e__server_id"],
+                            first["e__advanced_settings"])
+        registrations = []
+        for row in rows:
+            if row["r__id"] is None:
+                continue  # Event without registrations
+            character = CharacterRecord(row["c__id"], row["c__class_type"], row["c__character_name"],
+                                        row["c__item_lvl"], row["c__user_id"], row["c__api_id"])
+            registrations.append(RegistrationRecord(row["r__id"], row["r__user_id"], row["r__substitute"],
+                                                    row["r__registered_at"], row["r__notify_before"], character))
+        return RosterRecord(event, ServerRecord(first["s__id"], first["s__lang"]), registrations)
+
+    @classmethod
+    async def fetch_preset_names(cls, server_id: int) -> list[str]:
+        return [row["name"] for row in await cls._fetch("preset_names", cls.PRESET_NAMES, server_id)]
+
+    @classmethod
+    async def fetch_characters(cls, user_id: int) -> list[CharacterRecord]:
+        return [CharacterRecord(*row) for row in await cls._fetch("characters", cls.CHARACTERS, user_id)]
+
+    @classmethod
+    async def fetch_profile_events(cls, user_id: int) -> list[ProfileEventRecord]:
+        rows = await cls._fetch("profile_events", cls.PROFILE_EVENTS, user_id, EventStates.PLANING)
+        return [ProfileEventRecord(*row) for row in rows]
+
+    @classmethod
+    async def fetch_upcoming_events(cls, until: Union[int, float]) -> list[EventTimerRecord]:
+        rows = await cls._fetch("upcoming_events", cls.UPCOMING_EVENTS, EventStates.PLANING, int(until))
+        return [EventTimerRecord(*row) for row in rows]
+
+    @classmethod
+    async def fetch_stat_counters(cls) -> tuple[list[tuple[int, int]], int]:
+        """
+        :return: (class_type, count) ordered by count and the number of users
+        """
+        class_counts = []
+        user_count = 0
+        for kind, key, count in await cls._fetch("stat_counters", cls.STAT_COUNTERS):
+            if kind == "class":
+                class_counts.append((key, count))
+            elif kind == "users":
+                user_count = count
+        return class_counts, user_count
+
+    @classmethod
+    async def reconcile_stat_counters(cls) -> list[tuple[str, int, int]]:
+        """
+        Recount the counters from the source tables.
+        The counter table is locked against the triggers for the duration, so no change is lost in between.
+        :return: (kind, key, count) of every counter that had drifted
+        """
+        async with in_transaction("main") as connection:
+            await connection.execute_script("LOCK TABLE stat_counter IN SHARE ROW EXCLUSIVE MODE")
+            rows = await connection.execute_query_dict(cls.RECONCILE_STAT_COUNTERS)
+        return [(row["kind"], row["key"], row["count"]) for row in rows]
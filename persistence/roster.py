@@ -0,0 +1,149 @@
+from collections import Counter
+from typing import Optional, Type
+
+from tortoise import connections, Model
+
+from persistence.models import Event, EventRegister, PlayerCharacter, Server, Users
+
+
+def _columns(model: Type[Model], alias: str) -> str:
+    return ", ".join(f"{alias}.{column} AS {alias}__{column}" for column in model._meta.db_fields)
+
+
+def _init_prefixed(model: Type[Model], alias: str, row: dict):
+    prefix = alias + "__"
+    return model._init_from_db(**{column: row[prefix + column] for column in model._meta.db_fields})
+
+
+class RosterSummary:
+    """
+    Counts of a roster, computed once on load and updated incrementally on changes.
+    Class and support counts only cover the main list.
+    """
+    __slots__ = ("main_count", "substitute_count", "class_counts", "support_count")
+
+    def __init__(self):
+        self.main_count = 0
+        self.substitute_count = 0
+        self.class_counts: Counter[int] = Counter()
+        self.support_count = 0
+
+    @classmethod
+    def from_registrations(cls, registrations: list[EventRegister]) -> "RosterSummary":
+        summary = cls()
+        for registration in registrations:
+            summary.add(registration)
+        return summary
+
+    def _count(self, registration: EventRegister, amount: int):
+        if registration.substitute:
+            self.substitute_count += amount
+            return
+        self.main_count += amount
+        character_class = registration.character.character_class
+        self.class_counts[character_class.class_id] += amount
+        if character_class.has_tag("support"):
+            self.support_count += amount
+
+    def add(self, registration: EventRegister):
+        self._count(registration, 1)
+
+    def remove(self, registration: EventRegister):
+        self._count(registration, -1)
+
+
+class RegistrationLookup:
+    """
+    Registration lookup shared by :class:`Roster` and the read only roster records
+    """
+    __slots__ = ()
+    registrations: list
+
+    def get_registration(self, user_id: int):
+        for registration in self.registrations:
+            if registration.user_id == user_id:
+                return registration
+        return None
+
+
+class Roster(RegistrationLookup):
+    """
+    An event together with its creator, server and all registrations including their characters.
+    Everything is loaded with one joined query.
+    """
+    _SQL = None
+
+    def __init__(self, event: Event, registrations: list[EventRegister]):
+        self.event = event
+        self.registrations = registrations
+        self.summary = RosterSummary.from_registrations(registrations)
+
+    @property
+    def server(self) -> Server:
+        return self.event.server
+
+    @property
+    def creator(self) -> Users:
+        return self.event.creator
+
+    def add_registration(self, registration: EventRegister):
+        """
+        :param registration: New registration with its character set
+        """
+        self.registrations.append(registration)
+        self.summary.add(registration)
+
+    def set_substitute(self, registration: EventRegister, substitute: bool):
+        self.summary.remove(registration)
+        registration.substitute = substitute
+        self.summary.add(registration)
+
+    @classmethod
+    def _get_sql(cls) -> str:
+        if cls._SQL is None:
+            cls._SQL = f"""SELECT {_columns(Event, "e")}, {_columns(Server, "s")}, {_columns(Users, "u")},
+                                  {_columns(EventRegister, "r")}, {_columns(PlayerCharacter, "c")}
+                           FROM event AS e
+                           JOIN server AS s ON s.id = e.server_id
+                           JOIN users AS u ON u.id = e.creator_id
+                           LEFT JOIN eventregister AS r ON r.event_id = e.id
+                           LEFT JOIN playercharacter AS c ON c.id = r.character_id
+                           WHERE e.{{}} = $1
+                           ORDER BY r.registered_at, r.id"""
+        return cls._SQL
+
+    @classmethod
+    async def _load(cls, column: str, value: int, connection=None, lock=False) -> Optional["Roster"]:
+        """
+        :param connection: Connection to run the query on, pass the transaction when locking
+        :param lock: Lock the event row until the transaction ends
+        """
+        sql = cls._get_sql().format(column)
+        if lock:
+            sql += " FOR UPDATE OF e"
+        connection = connection or connections.get("main")
+        rows = await connection.execute_query_dict(sql, [value])
+        if len(rows) == 0:
+            return None
+        event = _init_prefixed(Event, "e", rows[0])
+        event.server = _init_prefixed(Server, "s", rows[0])
+        event.creator = _init_prefixed(Users, "u", rows[0])
+        registrations = []
+        for row in rows:
+            if row["r__id"] is None:
+                continue  # Event without registrations
+            registration = _init_prefixed(EventRegister, "r", row)
+            registration.character = _init_prefixed(PlayerCharacter, "c", row)
+            registration.event = event
+            registrations.append(registration)
+        # Fill the reverse relation so code working on the event sees the same registrations
+        event.registered_users._set_result_for_query(registrations)
+        return cls(event, registrations)
+
+    @classmethod
+    async def load(cls, event_id: int, connection=None, lock=False) -> Optional["Roster"]:
+        return await cls._load("id", event_id, connection, lock)
+
+    @classmethod
+    async def load_by_message(cls, message_id: int) -> Optional["Roster"]:
+        return await cls._load("message_id", message_id)
@@ -0,0 +1,77 @@
+import contextlib
+import logging
+import time
+
+from tortoise import connections
+
+from persistence import EventStates
+from persistence.models import Event, Server
+from persistence.repository import Repository
+from utils.caches import EventMeta, EventMetaCache
+
+logger = logging.getLogger("Neria")
+
+
+class Warmup:
+    """
+    Startup phase run after the database connection is configured.
+    Opens the pool, prepares the hot statements on every pooled connection and fills the caches
+    with the data of active events only.
+    """
+
+    def __init__(self):
+        self.phases: list[tuple[str, float]] = []
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    async def run(self):
+        client = connections.get("main")
+        with self.phase("open_pool"):
+            async with client.acquire_connection():
+                pass  # Creating the pool connects minsize connections
+        with self.phase("prepare_statements"):
+            await self.prepare_statements(client)
+        with self.phase("guild_settings"):
+            await self.load_guild_settings()
+        with self.phase("event_meta"):
+            await self.load_event_meta()
+        total = sum(duration for _, duration in self.phases)
+        breakdown = ", ".join(f"{name}={round(duration, 3)}s" for name, duration in self.phases)
+        logger.info(f"Warmup finished in {round(total, 3)} seconds ({breakdown})")
+
+    @staticmethod
+    async def prepare_statements(client):
+        statements = Repository.statements()
+        async with contextlib.AsyncExitStack() as stack:
+            # Hold minsize connections at once, so every idle connection gets the statements
+            pooled = [await stack.enter_async_context(client.acquire_connection())
+                      for _ in range(client.pool_minsize)]
+            for connection in pooled:
+                for sql, args in statements.values():
+                    await connection.fetch(sql, *args)
+        logger.debug(f"Prepared {len(statements)} statements on {len(pooled)} connections")
+
+    @staticmethod
+    async def load_guild_settings():
+        servers = await Server.filter(
+            all_events__state=EventStates.PLANING
+        ).distinct().limit(Server.SETTINGS_CACHE_SIZE)
+        for server in servers:
+            Server.KNOWN_IDS.add(server.id)
+            Server.cache_settings(server)
+        logger.debug(f"Loaded settings of {len(servers)} guilds with active events")
+
+    @staticmethod
+    async def load_event_meta():
+        rows = await Event.filter(
+            state=EventStates.PLANING, message_id__isnull=False
+        ).limit(EventMetaCache.ENTRIES.maxsize).values_list("message_id", "id", "creator_id", "state")
+        for message_id, event_id, creator_id, state in rows:
+            EventMetaCache.put(message_id, EventMeta(event_id, creator_id, state))
+        logger.debug(f"Loaded metadata of {len(rows)} active events")
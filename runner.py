@@ -7,7 +7,8 @@ import time
 import coloredlogs
 from tortoise import Tortoise
 from bot import Neria
-from persistence.models import Event
+from persistence.warmup import Warmup
+from utils import db_metrics
 from utils.config_manager import ConfigManager
 
 ConfigManager.load()
@@ -46,11 +47,14 @@ def migrate():
 
 async def init_tortoise():
     logger.info("Creating Database connection...")
+    db_metrics.install()
+    start = time.perf_counter()
     await Tortoise.init(config=ConfigManager.load_tortoise_config())
-    x = await Event.all()
+    logger.info(f"Database configured in {round(time.perf_counter() - start, 3)} seconds")
     if "create_schemas" in sys.argv:
         logger.info("Creating Database schema...")
         await Tortoise.generate_schemas()
+    await Warmup().run()
 
 
 async def run_app(neria: Neria):
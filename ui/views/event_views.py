@@ -1,3 +1,4 @@
+import contextlib
 import typing
 
 import discord.ui
@@ -10,6 +11,8 @@ from persistence.models import Server, Event, EventPreset
 from ui.modals.input_fields import NumberInputField, RoleInputField, BoolInputField
 from ui.modals.settings_modals import ExtraSettingsModal, PresetSettingsModal, CreateEventSettings
 from ui.views import LFGRegisterViewPersistent
+from utils.caches import EventEmbedCache
+from utils.locks import EventLocks
 from utils.overwrites import BetterEmbed, FixedView
 
 if typing.TYPE_CHECKING:
@@ -52,12 +55,14 @@ class DeleteEventView(discord.ui.View):
         await interaction.response.send_message(embed=embed, ephemeral=True)
         self.event.state = EventStates.ENDED
         await self.event.save()
+        self.bot.scheduler.untrack_event(self.event)
         await self.message.delete()
         self.stop()
 
     async def on_timeout(self) -> None:
         self.event.state = EventStates.ENDED
         await self.event.save()
+        self.bot.scheduler.untrack_event(self.event)
         try:
             await self.message.delete()
         except discord.HTTPException:
@@ -76,14 +81,18 @@ class SettingsViewBase(FixedView):
     def _get_modal(self):
         raise NotImplementedError
 
+    def _lock(self) -> typing.AsyncContextManager:
+        return contextlib.nullcontext()
+
     @discord.ui.button(label="Settings")
     async def settings(self, interaction: discord.Interaction, _):
         await self.db_data.refresh_from_db()
         modal = self._get_modal()
         await interaction.response.send_modal(modal)
         new_interaction, result = await modal.get_result(180)
-        await self.db_data.update_from_dict(result)
-        await self.db_data.save()
+        async with self._lock():
+            await self.db_data.update_from_dict(result)
+            await self.db_data.save()
         await self.on_settings_updated(new_interaction, self.db_data)
 
     @discord.ui.button(label="Extra settings")
@@ -122,8 +131,9 @@ class SettingsViewBase(FixedView):
         )
         await interaction.response.send_modal(modal)
         new_interaction, result = await modal.get_result()
-        self.db_data.advanced_settings = result
-        await self.db_data.save()
+        async with self._lock():
+            self.db_data.advanced_settings = result
+            await self.db_data.save()
         await self.on_extra_settings_updated(new_interaction, self.db_data)
 
     @button(label="Extra settings 2")
@@ -141,8 +151,9 @@ class SettingsViewBase(FixedView):
         )
         await interaction.response.send_modal(modal)
         new_interaction, result = await modal.get_result()
-        self.db_data.advanced_settings = result
-        await self.db_data.save()
+        async with self._lock():
+            self.db_data.advanced_settings = result
+            await self.db_data.save()
         await self.on_extra_settings_updated(new_interaction, self.db_data)
 
     async def on_settings_updated(self, interaction, data):
@@ -185,11 +196,16 @@ class EventSettingsView(SettingsViewBase):
     def __init__(self, server, db_data, member, bot: "Neria"):
         super().__init__(server, db_data, member, bot)
 
+    def _lock(self):
+        return EventLocks.lock(self.db_data.id)
+
     def _get_modal(self):
         return CreateEventSettings(self.server.time_offset,
                                    db_data=self.db_data, title="Edit settings", require=self.require)
 
     async def on_settings_updated(self, interaction, data):
+        self.bot.scheduler.track_event(data)
+        EventEmbedCache.invalidate(data.id)
         await interaction.response.send_message("👍", ephemeral=True)
         await self.bot.event_manager.update_event_message(data)
 
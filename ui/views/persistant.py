@@ -1,19 +1,20 @@
-import datetime
-import time
 import typing
 
 import discord.ui
-import pytz
 from discord import Interaction, TextStyle
 from discord.ui import button, Item
 from locales.gen import LanguageSchema, get_language
 
-from persistence.models import Event, EventRegister, Server, Users, PlayerCharacter
+from persistence.models import Users
+from persistence.registration import RegistrationService
+from persistence.roster import Roster
 from errors import registration
-from errors.basic import EventNotFound
+from errors.basic import EventNotFound, ModalInteractionCallbackError
 from ui.modals.dynamic_modal import DynamicModal
 from ui.modals.input_fields import StringInputField
 from ui.views.selects import CharactersSelectView, SetReminderView
+from utils.caches import EventEmbedCache, EventMetaCache
+from utils.locks import EventLocks
 from utils.overwrites import FixedView, BetterEmbed
 from utils.utils import Cooldown
 
@@ -25,7 +26,7 @@ class LFGPingViewPersistent(FixedView):
     def __init__(self, bot: "Neria"):
         super(LFGPingViewPersistent, self).__init__(timeout=None)
         self.bot = bot
-        self.cd = Cooldown(ttl=300)
+        self.cd = Cooldown.get_shared("lfg_ping", ttl=300)
 
     @button(
         label="DM all",
@@ -33,9 +34,9 @@ class LFGPingViewPersistent(FixedView):
         style=discord.ButtonStyle.blurple
     )
     async def dm_all_callback(self, interaction: discord.Interaction, _):
-        event = await Event.get_or_none(message_id=interaction.message.id)
+        meta = await EventMetaCache.get(interaction.message.id)
         await interaction.response.defer()
-        await self.bot.event_manager.notify_all(event)
+        await self.bot.event_manager.notify_all(meta.event_id)
 
     @button(
         label="Ping all",
@@ -43,17 +44,15 @@ class LFGPingViewPersistent(FixedView):
         style=discord.ButtonStyle.blurple
     )
     async def ping_all_callback(self, interaction: discord.Interaction, _):
-        event = await Event.get_or_none(message_id=interaction.message.id)
-        await event.fetch_participants(include_users=True)
+        roster = await Roster.load_by_message(interaction.message.id)
         pings = []
-        for register in event.registered_users:
-            pings.append(f"<@{register.user.id}>")
+        for register in roster.registrations:
+            pings.append(f"<@{register.user_id}>")
         await interaction.response.send_message(", ".join(pings))
 
     async def interaction_check(self, interaction: Interaction):
-        event: "Event" = await Event.get(message_id=interaction.message.id).prefetch_related("creator")
-        creator = event.creator.id
-        if creator == interaction.user.id:
+        meta = await EventMetaCache.get(interaction.message.id)
+        if meta is not None and meta.creator_id == interaction.user.id:
             if not self.cd.can_execute((interaction.message.id, interaction.user.id)):
                 embed = BetterEmbed(BetterEmbed.ERROR)
                 embed.set_header("Cooldown")
@@ -72,7 +71,7 @@ class LFGRegisterViewPersistent(FixedView):
     def __init__(self, bot: "Neria"):
         super(LFGRegisterViewPersistent, self).__init__(timeout=None)
         self.bot = bot
-        self.cd = Cooldown(10)
+        self.cd = Cooldown.get_shared("lfg_register", ttl=10)
 
     @button(
         label="Register",
@@ -96,12 +95,12 @@ class LFGRegisterViewPersistent(FixedView):
         style=discord.ButtonStyle.secondary
     )
     async def deregister_callback(self, interaction: discord.Interaction, _):
-        lfg_search = await self.get_event_or_rise(interaction.message.id)
-        await lfg_search.fetch_participants()
-        server = await lfg_search.server
+        roster = await self.get_roster_or_rise(interaction.message.id)
+        lfg_search = roster.event
+        server = roster.server
         lang: LanguageSchema.utils.deregister_callback = get_language(server.lang,
                                                                       LanguageSchema.utils.deregister_callback)
-        registration = await EventRegister.get_or_none(user_id=interaction.user.id, event_id=lfg_search.id)
+        registration = roster.get_registration(interaction.user.id)
         if not registration:
             return
         if lfg_search.advanced_settings and lfg_search.advanced_settings.text_on_exit:
@@ -125,9 +124,11 @@ class LFGRegisterViewPersistent(FixedView):
 
         else:
             await interaction.response.defer()
-        await registration.delete()
-        e = await self.bot.event_manager.build_event_embed(lfg_search)
-        await interaction.followup.edit_message(interaction.message.id, embed=e)
+        async with EventLocks.lock(lfg_search.id):
+            await registration.delete()
+        self.bot.scheduler.untrack_registration(registration)
+        EventEmbedCache.invalidate(lfg_search.id)
+        self.bot.event_manager.refresh_event_message(lfg_search, interaction)
 
     @discord.ui.button(
         label="Kick",
@@ -135,19 +136,19 @@ class LFGRegisterViewPersistent(FixedView):
         style=discord.ButtonStyle.danger
     )
     async def kick_part(self, interaction: discord.Interaction, _):
-        event = await self.get_event_or_rise(interaction.message.id)
-        server = await event.server
-        lang: LanguageSchema.utils.kick_callback = get_language(server.lang, LanguageSchema.utils.kick_callback)
+        roster = await self.get_roster_or_rise(interaction.message.id)
+        event = roster.event
+        lang: LanguageSchema.utils.kick_callback = get_language(roster.server.lang,
+                                                                LanguageSchema.utils.kick_callback)
         embed = BetterEmbed(BetterEmbed.DEFAULT)
         embed.set_default_thumbnail()
-        if interaction.user.id != (await event.creator).id:
+        if interaction.user.id != roster.creator.id:
             embed.change_type(BetterEmbed.ERROR)
             embed.description = lang.no_perm.get_string()
             embed.set_header(lang.error_header.get_string())
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
-        await event.fetch_participants(include_users=True)
-        to_select = [user.character for user in event.registered_users]
+        to_select = [user.character for user in roster.registrations]
         if len(to_select) > 25:
             embed.change_type(BetterEmbed.ERROR)
             embed.description = lang.to_many_parts.get_string()
@@ -168,18 +169,19 @@ class LFGRegisterViewPersistent(FixedView):
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
         interaction_new, result = await view.get_result()
         embed.change_type(BetterEmbed.OK)
-        db_user = await result.user
         embed.description = lang.suc.get_string(result.character_name,
-                                                interaction_new.client.get_user(db_user.id).mention)
+                                                interaction_new.client.get_user(result.user_id).mention)
         embed.set_header(lang.suc_header.get_string())
-        for player in event.registered_users:
+        for player in roster.registrations:
             if player.character.id == result.id:
-                await player.delete()
+                async with EventLocks.lock(event.id):
+                    await player.delete()
+                self.bot.scheduler.untrack_registration(player)
+                EventEmbedCache.invalidate(event.id)
                 break
 
         await interaction_new.response.edit_message(embed=embed, view=None)
-        e = await self.bot.event_manager.build_event_embed(event)
-        await interaction.followup.edit_message(interaction.message.id, embed=e)
+        self.bot.event_manager.refresh_event_message(event, interaction)
 
     @button(
         label="Remind me overwrite",
@@ -187,9 +189,10 @@ class LFGRegisterViewPersistent(FixedView):
         custom_id="neria:remind_me"
     )
     async def remind_me(self, interaction: discord.Interaction, _):
-        event = await self.get_event_or_rise(interaction.message.id)
-        server = await event.server
-        registration_ = await EventRegister.get_or_none(event=event, user_id=interaction.user.id)
+        roster = await self.get_roster_or_rise(interaction.message.id)
+        event = roster.event
+        server = roster.server
+        registration_ = roster.get_registration(interaction.user.id)
         if registration_ is None:
             await interaction.response.send_message("Not registered", ephemeral=True)
             return
@@ -202,6 +205,7 @@ class LFGRegisterViewPersistent(FixedView):
         new_interaction, result = await view.get_result()
         registration_.notify_before = result
         await registration_.save()
+        self.bot.scheduler.track_registration(registration_, event)
         embed.change_type(BetterEmbed.OK)
         embed.set_header(lang.on_title.get_string())
         embed.description = lang.desc_ok.get_string()
@@ -221,12 +225,12 @@ class LFGRegisterViewPersistent(FixedView):
         return True
 
     async def register(self, interaction: discord.Interaction, secondary):
-        server = await Server.get_safe(interaction.guild.id)
         db_user = await Users.get_safe(interaction.user.id)
         await db_user.fetch_characters()
-        lfg_search = await self.get_event_or_rise(interaction.message.id)
-        await lfg_search.fetch_participants(include_users=True)
-        registration_event = await EventRegister.get_or_none(user_id=db_user.id, event_id=lfg_search.id)
+        roster = await self.get_roster_or_rise(interaction.message.id)
+        lfg_search = roster.event
+        server = roster.server
+        registration_event = roster.get_registration(db_user.id)
         lang: LanguageSchema.utils.register_callback = get_language(server.lang,
                                                                     LanguageSchema.utils.register_callback)
         discord_user = interaction.guild.get_member(db_user.id)
@@ -235,21 +239,14 @@ class LFGRegisterViewPersistent(FixedView):
             # Check if we just want to switch sides
             await interaction.response.defer()
             if registration_event.substitute != secondary:
-                if not secondary:
-                    await registration_event.fetch_character()
-                    self.can_register(server, discord_user, lfg_search)
-                    self.filter_register_characters(lfg_search,
-                                                    [registration_event.character])  # Dirty why of reusing the method
-                registration_event.substitute = not registration_event.substitute  # Negate = Switching sides
-                registration_event.registered_at = int(time.time())
-                await registration_event.save()
-                embed = await self.bot.event_manager.build_event_embed(lfg_search)
-                await interaction.followup.edit_message(interaction.message.id, embed=embed)
-                return
-            else:
-                return
+                async with EventLocks.lock(lfg_search.id):
+                    switched = await RegistrationService.switch_side(lfg_search, discord_user, secondary)
+                if switched:
+                    EventEmbedCache.invalidate(lfg_search.id)
+                    self.bot.event_manager.refresh_event_message(lfg_search, interaction)
+            return
 
-        if lfg_search.registered_count >= lfg_search.max_players and not secondary:
+        if roster.summary.main_count >= lfg_search.max_players and not secondary:
             embed.change_type(BetterEmbed.ERROR)
             embed.set_header(lang.max_players_title.get_string())
             embed.description = lang.max_players_desc.get_string()
@@ -261,8 +258,8 @@ class LFGRegisterViewPersistent(FixedView):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
         if not secondary:
-            self.can_register(server, discord_user, lfg_search)
-            filtered_characters = self.filter_register_characters(lfg_search, db_user.characters)
+            RegistrationService.can_register(discord_user, lfg_search)
+            filtered_characters = RegistrationService.filter_register_characters(roster, db_user.characters)
         else:
             filtered_characters = db_user.characters
         embed.set_header(lang.title.get_string())
@@ -270,107 +267,28 @@ class LFGRegisterViewPersistent(FixedView):
         view = CharactersSelectView(discord_user, filtered_characters)  # noqa
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
         new_interaction, result = await view.get_result()
-        # Check if there is no entry in the db to ensure that we don't insert twice.
-        # A lock would be better but im lazy
-        # Todo: Implement lock
-        second_register_check = await EventRegister.get_or_none(user_id=db_user.id, event_id=lfg_search.id)
-        if second_register_check is not None:
+        # The roster may have changed while the user was selecting, everything is checked again on the locked event
+        try:
+            async with EventLocks.lock(lfg_search.id):
+                registration_event = await RegistrationService.register(lfg_search, discord_user, result, secondary)
+        except (registration.PlayersFullError, registration.RequirementsNotMetError,
+                registration.NoPrioRoleError, EventNotFound) as e:
+            raise ModalInteractionCallbackError(e, new_interaction)
+        if registration_event is None:
             await new_interaction.response.defer()
             return
-        await EventRegister.create(
-            event=lfg_search,
-            user=db_user,
-            character=result,
-            registered_at=int(time.time()),
-            substitute=secondary
-        )
+        self.bot.scheduler.track_registration(registration_event, lfg_search)
+        EventEmbedCache.invalidate(lfg_search.id)
         embed.description = lang.fin.get_string()
         embed.change_type(BetterEmbed.OK)
         await new_interaction.response.edit_message(embed=embed, view=None)
-        embed = await self.bot.event_manager.build_event_embed(lfg_search)
-        await interaction.followup.edit_message(interaction.message.id, embed=embed)
-
-    def can_register(self, server: Server, user: discord.Member, event: Event):
-        if event.advanced_settings is None:
-            return
-        role_ids = event.advanced_settings.prio_roles
-        prio_roles = []
-        for i in role_ids:
-            role = user.guild.get_role(i)
-            if role:
-                prio_roles.append(role)
-
-        if len(prio_roles) == 0:
-            return
-
-        seconds_ignore = event.advanced_settings.prio_time * 60
-        now = datetime.datetime.now(tz=pytz.UTC).timestamp()
-        starts_in = event.event_start - now
-        if (starts_in - seconds_ignore) < 0:
-            return
-        for role in prio_roles:
-            if role in user.roles:
-                return
-        raise registration.NoPrioRoleError(prio_roles, event.event_start - seconds_ignore)
-
-    def filter_register_characters(self, event: Event, character_list: list[PlayerCharacter]):
-        """
-        Filter the users selection based of the advanced settings
-        :param character_list:
-        :param event:
-        :return:
-        """
-        character_list = [i for i in character_list]
-        space_left = event.max_players - event.registered_count
-        if space_left <= 0:
-            raise registration.PlayersFullError(event.max_players)
-
-        if event.advanced_settings is None:
-            return character_list
-        filtered_list = []
-
-        amount_support = 0
-        for entry in event.registered_users:
-            if entry.substitute:
-                continue
-            if entry.character.character_class.has_tag("support"):
-                amount_support += 1
-
-        registered_class_ids = []
-        for entry in event.registered_users:
-            if not entry.substitute:
-                registered_class_ids.append(entry.character.character_class.class_id)
-
-        if event.advanced_settings.max_same_class is not None:
-            for character in character_list:
-                if not (registered_class_ids.count(character.character_class.class_id) >=
-                        event.advanced_settings.max_same_class):
-                    filtered_list.append(character)
-
-        else:
-            filtered_list = character_list.copy()
-
-        if event.advanced_settings.min_gear_score is not None:
-            for character in filtered_list.copy():
-                if not character.item_lvl >= event.advanced_settings.min_gear_score:
-                    filtered_list.remove(character)
-
-        supports_required = event.advanced_settings.min_supporters - amount_support
-        if space_left <= supports_required:
-            for char in filtered_list.copy():
-                if not char.character_class.has_tag("support"):
-                    filtered_list.remove(char)
-
-        if len(filtered_list) == 0:
-            raise registration.RequirementsNotMetError
-
-        return filtered_list
+        self.bot.event_manager.refresh_event_message(lfg_search, interaction)
 
-    async def get_event_or_rise(self, id_):
-        event = await Event.get_or_none(message_id=id_)
-        if event is None or event.has_ended:
+    async def get_roster_or_rise(self, id_) -> Roster:
+        roster = await Roster.load_by_message(id_)
+        if roster is None or roster.event.has_ended:
             raise EventNotFound(id_)
-        return event
+        return roster
 
     async def on_error(self, interaction: Interaction, error: Exception, item) -> None:
         interaction.client.dispatch("ui_error", interaction, error)
@@ -7,8 +7,8 @@ class AutoCompleteCallbacks:
 
     @classmethod
     async def query_presets(cls, interaction: discord.Interaction, current: str):
-        presets = await CachedQueries.fetch_event_presets(interaction.guild.id)
-        ret = [discord.app_commands.Choice(name=i.name, value=i.name) for i in presets if i.name.startswith(current)]
+        names = await CachedQueries.fetch_preset_names(interaction.guild.id)
+        ret = [discord.app_commands.Choice(name=i, value=i) for i in names if i.startswith(current)]
         ret.sort(key=lambda i: i.name)
         if len(ret) > 25:
             ret = ret[:25]
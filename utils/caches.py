@@ -0,0 +1,140 @@
+import time
+import typing
+from collections import OrderedDict
+
+import discord
+
+from persistence.models import Event
+from utils.metrics import Metrics
+
+
+class LRUCache:
+    """
+    Small bounded mapping that drops the least recently used entry when full
+    """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self.map: OrderedDict = OrderedDict()
+
+    def __len__(self):
+        return len(self.map)
+
+    def __contains__(self, key):
+        return key in self.map
+
+    def get(self, key, default=None):
+        try:
+            value = self.map[key]
+        except KeyError:
+            return default
+        self.map.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.map[key] = value
+        self.map.move_to_end(key)
+        if len(self.map) > self.maxsize:
+            self.map.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self.map.pop(key, default)
+
+    def clear(self):
+        self.map.clear()
+
+
+class EventEmbedCache:
+    """
+    Rendered event embeds keyed by (event id, roster version, language).
+    Every change to an event or its roster has to call :meth:`invalidate`, which bumps the version
+    so the next build renders the embed again.
+    """
+    VERSIONS: dict[int, int] = {}
+    EMBEDS = LRUCache(maxsize=500)  # event_id -> {(version, lang): embed}
+
+    @classmethod
+    def version(cls, event_id: int) -> int:
+        return cls.VERSIONS.get(event_id, 0)
+
+    @classmethod
+    def invalidate(cls, event_id: int):
+        cls.VERSIONS[event_id] = cls.version(event_id) + 1
+        cls.EMBEDS.pop(event_id)
+
+    @classmethod
+    def forget(cls, event_id: int):
+        """
+        Drop everything cached for an event that ended
+        """
+        cls.VERSIONS.pop(event_id, None)
+        cls.EMBEDS.pop(event_id)
+
+    @classmethod
+    def get(cls, event_id: int, lang: str) -> typing.Optional[discord.Embed]:
+        embed = cls.EMBEDS.get(event_id, {}).get((cls.version(event_id), lang))
+        if embed is None:
+            Metrics.incr("event_embed_cache.miss")
+            return None
+        Metrics.incr("event_embed_cache.hit")
+        # Callers are free to modify the embed they get
+        return embed.copy()
+
+    @classmethod
+    def put(cls, event_id: int, lang: str, embed: discord.Embed, version: int):
+        """
+        :param version: Version read before the roster was loaded. Renders of an outdated version are dropped.
+        """
+        if version != cls.version(event_id):
+            return
+        rendered = cls.EMBEDS.get(event_id)
+        if rendered is None:
+            rendered = {}
+            cls.EMBEDS.put(event_id, rendered)
+        rendered[(version, lang)] = embed.copy()
+
+    @classmethod
+    def stats(cls) -> dict[str, int]:
+        return {
+            "hits": Metrics.get("event_embed_cache.hit"),
+            "misses": Metrics.get("event_embed_cache.miss"),
+            "size": len(cls.EMBEDS)
+        }
+
+
+class EventMeta(typing.NamedTuple):
+    event_id: int
+    creator_id: int
+    state: int
+
+
+class EventMetaCache:
+    """
+    Event id, creator and state per event message, so button checks don't have to load the event.
+    Entries expire after ``TTL`` seconds and are invalidated whenever an event stops being tracked.
+    """
+    TTL = 300
+    ENTRIES = LRUCache(maxsize=2000)  # message_id -> (expires_at, EventMeta)
+
+    @classmethod
+    async def get(cls, message_id: int) -> typing.Optional[EventMeta]:
+        cached = cls.ENTRIES.get(message_id)
+        if cached is not None and cached[0] > time.monotonic():
+            Metrics.incr("event_meta_cache.hit")
+            return cached[1]
+        Metrics.incr("event_meta_cache.miss")
+        rows = await Event.filter(message_id=message_id).values_list("id", "creator_id", "state")
+        if len(rows) == 0:
+            cls.ENTRIES.pop(message_id)
+            return None
+        meta = EventMeta(*rows[0])
+        cls.put(message_id, meta)
+        return meta
+
+    @classmethod
+    def put(cls, message_id: int, meta: EventMeta):
+        cls.ENTRIES.put(message_id, (time.monotonic() + cls.TTL, meta))
+
+    @classmethod
+    def invalidate(cls, message_id: int):
+        cls.ENTRIES.pop(message_id)
@@ -0,0 +1,99 @@
+"""
+Per row cost of decoding ``advanced_settings``, the only :class:`persistence.db_fields.PydanticDBField`
+in the models, shared by Event and EventPreset rows.
+Compares the old decoding (``json.loads`` + model validation on every row) with the new one
+(pydantic-core's JSON parser through a cached TypeAdapter, identical payloads shared through an LRU).
+pydantic-core's parser takes the place of an optional faster JSON backend, so no extra dependency is needed.
+Runs on an in memory sqlite connection, no database setup is required.
+
+Usage: python -m utils.db_fields_bench [rows] (or make bench-db-fields)
+"""
+import asyncio
+import json
+import sys
+import time
+import typing
+
+from tortoise import Tortoise
+
+from persistence.db_fields import PydanticDBField
+from persistence.models import Event, EventPreset
+from persistence.pydantic_models import AdvancedOptions
+
+PAYLOADS = [
+    AdvancedOptions().model_dump_json(),
+    AdvancedOptions(min_gear_score=1460, max_same_class=2, min_supporters=2).model_dump_json(),
+    AdvancedOptions(prio_roles=[1017830912345678901, 1017830912345678902], prio_time=900,
+                    ping_roles=[1017830912345678903], text_on_exit=True).model_dump_json(),
+]
+
+
+def _legacy_decode(value: typing.Union[str, bytes]) -> AdvancedOptions:
+    return AdvancedOptions(**json.loads(value))
+
+
+def _event_row(i: int, payload: str) -> dict:
+    return {"id": i, "title": "Valtan hard", "description": "", "max_players": 8, "advanced_settings": payload,
+            "creator_id": 1, "server_id": 1, "event_start": 1700000000, "channel_id": 1, "message_id": i,
+            "weekly": False, "last_dispatch": None, "guild_event_id": None, "state": 0}
+
+
+def _preset_row(i: int, payload: str) -> dict:
+    return {"id": i, "title": "Valtan hard", "description": "", "max_players": 8, "advanced_settings": payload,
+            "server_id": 1, "name": f"preset {i}", "partial": False}
+
+
+def _time(name: str, func: typing.Callable[[int], typing.Any], rows: int, baseline: typing.Optional[float] = None):
+    for i in range(min(rows, 1000)):
+        func(i)  # Warm up
+    start = time.perf_counter()
+    for i in range(rows):
+        func(i)
+    per_row = (time.perf_counter() - start) / rows * 1e6
+    speedup = f", {round(baseline / per_row, 2)}x" if baseline else ""
+    print(f"{name:<34} {per_row:.2f}us per row{speedup}")
+    return per_row
+
+
+def _columns(model, row: dict) -> dict:
+    return {column: row[column] for column in model._meta.db_fields}
+
+
+def run(rows: int):
+    payload = PAYLOADS[2]
+    unique = [AdvancedOptions(min_gear_score=i).model_dump_json() for i in range(rows)]
+
+    print("decode only, same payload")
+    base = _time("legacy json.loads + validate", lambda i: _legacy_decode(payload), rows)
+    _time("adapter validate_json", lambda i: PydanticDBField.ADAPTER.validate_json(payload), rows, base)
+    _time("adapter + LRU", lambda i: PydanticDBField.decode(payload), rows, base)
+
+    print("decode only, distinct payloads (LRU misses)")
+    base = _time("legacy json.loads + validate", lambda i: _legacy_decode(unique[i]), rows)
+    _time("adapter + LRU", lambda i: PydanticDBField.decode(unique[i]), rows, base)
+
+    for model, make_row in ((Event, _event_row), (EventPreset, _preset_row)):
+        name = model.__name__
+        prepared = [_columns(model, make_row(i, PAYLOADS[i % len(PAYLOADS)])) for i in range(rows)]
+        print(f"{name} rows, {len(PAYLOADS)} payloads")
+
+        def legacy(i):
+            instance = model._init_from_db(**prepared[i])
+            # The old field decoded every row while it was loaded
+            return _legacy_decode(prepared[i]["advanced_settings"]) if instance is not None else None
+
+        base = _time("legacy init + decode", legacy, rows)
+        _time("lazy init, not accessed", lambda i: model._init_from_db(**prepared[i]), rows, base)
+        _time("lazy init, accessed", lambda i: model._init_from_db(**prepared[i]).advanced_settings, rows, base)
+
+
+async def main(rows: int):
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["persistence.models"]})
+    try:
+        run(rows)
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import re
+import time
+import typing
+
+import asyncpg.pool
+from tortoise import connections
+from tortoise.backends.asyncpg.client import AsyncpgDBClient, TransactionWrapper
+
+from utils.config_manager import ConfigManager
+from utils.metrics import Metrics
+
+logger = logging.getLogger("Neria")
+
+#  Overwrites to see how the connection pool behaves and which statements are slow.
+_TABLE_PATTERN = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+\"?(\w+)", re.IGNORECASE)
+_STATEMENT_NAMES: dict[str, str] = {}
+_old_acquire = asyncpg.pool.Pool.acquire
+
+
+def statement_name(query: str) -> str:
+    """
+    Short name of a statement, e.g. "select.event", used as metric name
+    """
+    name = _STATEMENT_NAMES.get(query)
+    if name is None:
+        stripped = query.lstrip()
+        verb = stripped.split(None, 1)[0].lower() if stripped else "empty"
+        table = _TABLE_PATTERN.search(query)
+        name = f"{verb}.{table.group(1)}" if table else verb
+        if len(_STATEMENT_NAMES) > 1000:
+            _STATEMENT_NAMES.clear()
+        _STATEMENT_NAMES[query] = name
+    return name
+
+
+class PoolMonitor:
+    """
+    Acquire wait times, pool usage and statement latency of the asyncpg pool.
+    Waits longer than ``db_acquire_wait_alert`` seconds are logged as warnings, at most once per ``ALERT_INTERVAL``.
+    """
+    ALERT_INTERVAL = 60
+    alert_threshold = 0.5
+    _last_alert = 0.0
+    _suppressed = 0
+
+    @classmethod
+    def get_pool(cls) -> typing.Optional[asyncpg.Pool]:
+        try:
+            return connections.get("main")._pool
+        except Exception:
+            return None  # Tortoise is not initialised yet
+
+    @classmethod
+    def in_use(cls) -> typing.Optional[int]:
+        pool = cls.get_pool()
+        if pool is None:
+            return None
+        return pool.get_size() - pool.get_idle_size()
+
+    @classmethod
+    def size(cls) -> typing.Optional[int]:
+        pool = cls.get_pool()
+        return pool.get_size() if pool is not None else None
+
+    @classmethod
+    def record_wait(cls, waited: float):
+        Metrics.observe("db.acquire_wait", waited)
+        if waited <= cls.alert_threshold:
+            return
+        Metrics.incr("db.acquire_wait_alerts")
+        now = time.monotonic()
+        if now - cls._last_alert < cls.ALERT_INTERVAL:
+            cls._suppressed += 1
+            return
+        logger.warning(f"Waited {round(waited, 3)} seconds for a database connection "
+                       f"({cls.in_use()}/{cls.size()} in use, {cls._suppressed} more slow acquires since last alert)")
+        cls._last_alert = now
+        cls._suppressed = 0
+
+    @classmethod
+    async def keep_warm(cls, floor: int):
+        """
+        Touch ``floor`` connections at once, so idle connections are not closed by the pool
+        and closed ones are reconnected before the next burst.
+        """
+        pool = cls.get_pool()
+        if pool is None or floor <= 0:
+            return
+        held = []
+        try:
+            for _ in range(min(floor, pool.get_max_size())):
+                held.append(await _old_acquire(pool))
+            await asyncio.gather(*(connection.execute("SELECT 1") for connection in held))
+        finally:
+            for connection in held:
+                await pool.release(connection)
+
+
+class _TimedAcquire:
+    def __init__(self, context):
+        self.context = context
+        self.connection = None
+
+    def __await__(self):
+        start = time.perf_counter()
+        connection = yield from self.context.__await__()
+        PoolMonitor.record_wait(time.perf_counter() - start)
+        return connection
+
+    async def __aenter__(self):
+        self.connection = await self
+        return self.connection
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.context.pool.release(self.connection)
+
+
+def timed_acquire(self, *args, **kwargs):
+    return _TimedAcquire(_old_acquire(self, *args, **kwargs))
+
+
+def _timed_statement(func):
+    async def wrapper(self, query, *args, **kwargs):
+        with Metrics.timed(f"db.statement.{statement_name(query)}"):
+            return await func(self, query, *args, **kwargs)
+    return wrapper
+
+
+def install():
+    """
+    Install the overwrites. Has to be called before the first query.
+    """
+    PoolMonitor.alert_threshold = ConfigManager.get_setting_default("db_acquire_wait_alert", 0.5)
+    asyncpg.pool.Pool.acquire = timed_acquire
+    for cls in (AsyncpgDBClient, TransactionWrapper):
+        for name in ("execute_query", "execute_query_dict", "execute_insert", "execute_many"):
+            if name in cls.__dict__:
+                setattr(cls, name, _timed_statement(cls.__dict__[name]))
+    Metrics.register_gauge("db.pool_size", PoolMonitor.size)
+    Metrics.register_gauge("db.pool_in_use", PoolMonitor.in_use)
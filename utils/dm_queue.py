@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import time
+import typing
+from collections import OrderedDict
+
+import discord
+
+from utils.caches import LRUCache
+from utils.config_manager import ConfigManager
+from utils.metrics import Metrics
+
+if typing.TYPE_CHECKING:
+    from bot import Neria
+
+logger = logging.getLogger("Neria")
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _DirectMessage:
+    def __init__(self, user_id: int, kwargs: dict, future: asyncio.Future):
+        self.user_id = user_id
+        self.kwargs = kwargs
+        self.future = future
+        self.queued_at = time.perf_counter()
+
+
+class DirectMessageQueue:
+    """
+    Shared outbound queue for direct messages.
+    A fixed pool of workers caps the global concurrency and sending into a specific DM channel
+    is additionally throttled by its own token bucket.
+    Opening DM channels is left to the rate limit handling of discord.py.
+    """
+
+    def __init__(self, bot: "Neria"):
+        self.bot = bot
+        self.worker_count = ConfigManager.get_setting_default("dm_queue_workers", 4)
+        self.route_rate = ConfigManager.get_setting_default("dm_route_rate", (1.0, 5))  # (per second, burst)
+        self.channel_cache_size = ConfigManager.get_setting_default("dm_channel_cache_size", 2000)
+        self.queue: asyncio.Queue[_DirectMessage] = asyncio.Queue()
+        self.workers: list[asyncio.Task] = []
+        # The least recently used bucket is idle the longest, so it is full and can be dropped
+        self._buckets = LRUCache(maxsize=self.channel_cache_size)
+        self._channels: OrderedDict[int, discord.DMChannel] = OrderedDict()
+        Metrics.register_gauge("dm.queue_size", self.queue.qsize)
+
+    def start(self):
+        if self.workers:
+            return
+        for i in range(self.worker_count):
+            self.workers.append(asyncio.create_task(self._worker(), name=f"dm_worker_{i}"))
+        logger.info(f"Started DM queue with {self.worker_count} workers")
+
+    async def shutdown(self, timeout=10.0):
+        """
+        Wait up to ``timeout`` seconds for the queued messages to be sent, then stop the workers.
+        """
+        if not self.workers:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping DM queue with {self.queue.qsize()} unsent messages")
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        while not self.queue.empty():
+            self.queue.get_nowait().future.cancel()
+
+    def submit(self, user: typing.Union[discord.abc.Snowflake, int], **kwargs) -> asyncio.Future:
+        """
+        Queue a direct message. Takes the same keyword arguments as :meth:`discord.abc.Messageable.send`.
+        :return: Future that resolves to the sent message or the exception that occurred
+        """
+        user_id = user if isinstance(user, int) else user.id
+        future = asyncio.get_running_loop().create_future()
+        # Mark errors as retrieved, fire and forget callers don't care about them
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.queue.put_nowait(_DirectMessage(user_id, kwargs, future))
+        return future
+
+    async def send(self, user: typing.Union[discord.abc.Snowflake, int], **kwargs) -> discord.Message:
+        """
+        Queue a direct message and wait until it was sent.
+        """
+        return await self.submit(user, **kwargs)
+
+    def _get_bucket(self, route: str) -> TokenBucket:
+        bucket = self._buckets.get(route)
+        if bucket is None:
+            bucket = TokenBucket(*self.route_rate)
+            self._buckets.put(route, bucket)
+        return bucket
+
+    async def _get_channel(self, user_id: int) -> discord.DMChannel:
+        channel = self._channels.get(user_id)
+        if channel is not None:
+            self._channels.move_to_end(user_id)
+            Metrics.incr("dm.channel_cache_hit")
+            return channel
+        Metrics.incr("dm.channel_cache_miss")
+        channel = await self.bot.create_dm(discord.Object(user_id))
+        self._channels[user_id] = channel
+        if len(self._channels) > self.channel_cache_size:
+            self._channels.popitem(last=False)
+        return channel
+
+    async def _deliver(self, message: _DirectMessage):
+        channel = await self._get_channel(message.user_id)
+        await self._get_bucket(f"channel:{channel.id}").acquire()
+        Metrics.observe("dm.queue_wait", time.perf_counter() - message.queued_at)
+        with Metrics.timed("dm.latency"):
+            return await channel.send(**message.kwargs)
+
+    async def _worker(self):
+        while True:
+            message = await self.queue.get()
+            try:
+                result = await self._deliver(message)
+            except asyncio.CancelledError:
+                message.future.cancel()
+                raise
+            except Exception as e:
+                Metrics.incr("dm.failed")
+                if isinstance(e, discord.Forbidden):
+                    logger.debug(f"DMs of user {message.user_id} are closed")
+                else:
+                    logger.warning(f"Sending DM to user {message.user_id} failed", exc_info=e)
+                if not message.future.done():
+                    message.future.set_exception(e)
+            else:
+                Metrics.incr("dm.sent")
+                if not message.future.done():
+                    message.future.set_result(result)
+            finally:
+                self.queue.task_done()
@@ -0,0 +1,48 @@
+import asyncio
+import logging
+import typing
+
+from utils.metrics import Metrics
+
+logger = logging.getLogger("Neria")
+
+
+class EditCoalescer:
+    """
+    Collapses edits of the same message that arrive within ``delay`` seconds into a single request.
+    Only the latest submitted edit is executed. An edit submitted while another one is running
+    is executed afterwards, so the last requested state is always written.
+    """
+
+    def __init__(self, name: str, delay=1.0):
+        self.name = name
+        self.delay = delay
+        self.saved = 0
+        self._pending: dict[typing.Hashable, typing.Callable[[], typing.Awaitable]] = {}
+        self._running: dict[typing.Hashable, asyncio.Task] = {}
+
+    def submit(self, key: typing.Hashable, edit: typing.Callable[[], typing.Awaitable]):
+        """
+        :param key: Identifies the message, usually its id
+        :param edit: Coroutine function performing the edit. It should build the content when called,
+            so it always writes the latest state.
+        """
+        if key in self._pending:
+            self.saved += 1
+            Metrics.incr(f"{self.name}.coalesced")
+        self._pending[key] = edit
+        if key not in self._running:
+            self._running[key] = asyncio.create_task(self._flush(key))
+
+    async def _flush(self, key):
+        try:
+            while key in self._pending:
+                await asyncio.sleep(self.delay)
+                edit = self._pending.pop(key)
+                try:
+                    await edit()
+                except Exception as e:
+                    logger.warning(f"Edit of '{key}' in '{self.name}' failed", exc_info=e)
+                Metrics.incr(f"{self.name}.written")
+        finally:
+            self._running.pop(key, None)
@@ -0,0 +1,92 @@
+"""
+Runs EXPLAIN for the hot queries against the configured database and fails when one of them
+plans a sequential scan on a table that has an index for it.
+Sequential scans are disabled for the session, so the check also works on small dev databases
+where the planner would otherwise prefer them.
+
+Usage: python -m utils.explain_check (or make explain-check)
+"""
+import asyncio
+import json
+import logging
+import sys
+import time
+
+from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+
+from persistence import EventStates
+from persistence.roster import Roster
+from utils.config_manager import ConfigManager
+
+logger = logging.getLogger("Neria")
+
+
+def _hot_queries(now: int) -> list[tuple[str, str, list]]:
+    """
+    :return: (name, sql, values) of every query that has to use an index
+    """
+    return [
+        ("event_claim_due",
+         "UPDATE event SET state = $1 WHERE state = $2 AND event_start <= $3 RETURNING *",
+         [EventStates.ENDED, EventStates.PLANING, now]),
+        ("reminder_claim_due",
+         """SELECT r.id, r.user_id FROM eventregister AS r JOIN event AS e ON r.event_id = e.id
+            WHERE e.state = $1 AND r.notified = FALSE AND e.event_start - r.notify_before <= $2""",
+         [EventStates.PLANING, now]),
+        ("registration_lookup",
+         "SELECT id FROM eventregister WHERE event_id = $1 AND user_id = $2",
+         [1, 1]),
+        ("registrations_of_user",
+         "SELECT id FROM eventregister WHERE user_id = $1",
+         [1]),
+        ("roster_by_message",
+         Roster._get_sql().format("message_id"),
+         [1]),
+        ("message_delete_claim_due",
+         "DELETE FROM messagedeletequeue WHERE delete_at <= $1 RETURNING *",
+         [now]),
+    ]
+
+
+def _seq_scans(plan: dict) -> list[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+async def check() -> bool:
+    failed = False
+    async with in_transaction("main") as connection:
+        await connection.execute_script("SET LOCAL enable_seqscan = off")
+        for name, sql, values in _hot_queries(int(time.time())):
+            rows = await connection.execute_query_dict(f"EXPLAIN (FORMAT JSON) {sql}", values)
+            plan = rows[0]["QUERY PLAN"]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            seq_scans = _seq_scans(plan[0]["Plan"])
+            if seq_scans:
+                failed = True
+                logger.error(f"{name}: sequential scan on {', '.join(seq_scans)}")
+            else:
+                logger.info(f"{name}: ok")
+    return not failed
+
+
+async def main():
+    await Tortoise.init(config=ConfigManager.load_tortoise_config())
+    try:
+        ok = await check()
+    finally:
+        await Tortoise.close_connections()
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s | %(message)s")
+    ConfigManager.load()
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+import asyncio
+import contextlib
+import logging
+import time
+import typing
+from collections import OrderedDict
+
+from utils.metrics import Metrics
+
+logger = logging.getLogger("Neria")
+
+
+class _EventLock:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0  # Holders and waiters, a lock in use is never evicted
+
+
+class EventLocks:
+    """
+    In process locks per event id, so roster changes of the same event run one after another.
+    Locks are created on first use and the least recently used idle ones are dropped
+    once more than ``MAX_SIZE`` events are tracked.
+    """
+    MAX_SIZE = 1000
+    SLOW_WAIT = 1.0  # Waits longer than this are logged with the event id
+    LOCKS: OrderedDict[int, _EventLock] = OrderedDict()
+
+    @classmethod
+    def _get(cls, event_id: int) -> _EventLock:
+        entry = cls.LOCKS.get(event_id)
+        if entry is None:
+            entry = _EventLock()
+            cls.LOCKS[event_id] = entry
+            cls._evict(keep=event_id)
+        else:
+            cls.LOCKS.move_to_end(event_id)
+        return entry
+
+    @classmethod
+    def _evict(cls, keep: int):
+        """
+        :param keep: Event id that is never evicted, the entry that is about to be used
+        """
+        while len(cls.LOCKS) > cls.MAX_SIZE:
+            # Oldest entries come first, so the first idle one is usually found right away
+            victim = next((k for k, v in cls.LOCKS.items() if v.users == 0 and k != keep), None)
+            if victim is None:
+                return
+            cls.LOCKS.pop(victim)
+            Metrics.incr("event_lock.evicted")
+
+    @classmethod
+    @contextlib.asynccontextmanager
+    async def lock(cls, event_id: int) -> typing.AsyncIterator[None]:
+        """
+        Usage: ``async with EventLocks.lock(event.id): ...``
+        Never hold the lock while waiting for user input.
+        """
+        entry = cls._get(event_id)
+        entry.users += 1
+        try:
+            if entry.lock.locked():
+                Metrics.incr("event_lock.contended")
+            start = time.perf_counter()
+            async with entry.lock:
+                waited = time.perf_counter() - start
+                Metrics.observe("event_lock.wait", waited)
+                if waited > cls.SLOW_WAIT:
+                    logger.debug(f"Waited {round(waited, 2)} seconds for the lock of event {event_id}")
+                yield
+        finally:
+            entry.users -= 1
+
+    @classmethod
+    def size(cls) -> int:
+        return len(cls.LOCKS)
+
+
+Metrics.register_gauge("event_lock.size", EventLocks.size)
@@ -0,0 +1,113 @@
+import asyncio
+import datetime
+import logging
+import random
+import typing
+
+import aiohttp
+import discord
+
+from utils.metrics import Metrics
+
+if typing.TYPE_CHECKING:
+    from bot import Neria
+
+logger = logging.getLogger("Neria")
+
+# Discord only bulk deletes messages younger than 14 days, keep some margin
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=13, hours=23)
+BULK_DELETE_MAX_AMOUNT = 100
+
+
+class MessageOperations:
+    """
+    Edits and deletes messages by channel and message id using partial messages, so no GET is needed first.
+    Unknown messages or channels are handled here and transient errors are retried with backoff and jitter.
+    """
+
+    def __init__(self, bot: "Neria", retries=3, base_delay=0.5):
+        self.bot = bot
+        self.retries = retries
+        self.base_delay = base_delay
+        # Channels where the bot lacks Manage Messages, bulk delete is skipped for them
+        self.no_bulk_delete: set[int] = set()
+
+    def get_partial(self, channel_id: int, message_id: int) -> discord.PartialMessage:
+        return self.bot.get_partial_messageable(channel_id).get_partial_message(message_id)
+
+    async def _run(self, name: str, func: typing.Callable[[], typing.Awaitable]):
+        """
+        :return: Result of func or None if the message or channel does not exist anymore
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                with Metrics.timed(f"message_ops.{name}"):
+                    return await func()
+            except discord.NotFound:
+                Metrics.incr("message_ops.unknown_message")
+                return None
+            except (discord.DiscordServerError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.base_delay * 2 ** attempt
+                delay += random.uniform(0, delay)
+                Metrics.incr("message_ops.retries")
+                logger.debug(f"Message {name} failed ({e}), retrying in {round(delay, 2)} seconds")
+                await asyncio.sleep(delay)
+
+    async def edit(self, channel_id: int, message_id: int, **kwargs) -> bool:
+        """
+        Edit a message. Takes the same keyword arguments as :meth:`discord.PartialMessage.edit`.
+        :return: False if the message does not exist anymore
+        """
+        message = self.get_partial(channel_id, message_id)
+        return await self._run("edit", lambda: message.edit(**kwargs)) is not None
+
+    async def delete(self, channel_id: int, message_id: int) -> bool:
+        """
+        :return: False if the message did not exist anymore
+        """
+        message = self.get_partial(channel_id, message_id)
+
+        async def delete():
+            await message.delete()
+            return True
+
+        return await self._run("delete", delete) is not None
+
+    async def bulk_delete(self, channel_id: int, message_ids: list[int]):
+        """
+        Delete many messages of one channel. Messages young enough are removed with the bulk delete endpoint,
+        the rest and any failed bulk request fall back to single deletes.
+        """
+        min_time = discord.utils.utcnow() - BULK_DELETE_MAX_AGE
+        bulk = []
+        single = []
+        for message_id in message_ids:
+            if discord.utils.snowflake_time(message_id) > min_time:
+                bulk.append(message_id)
+            else:
+                single.append(message_id)
+        if channel_id in self.no_bulk_delete:
+            single.extend(bulk)
+            bulk = []
+        for i in range(0, len(bulk), BULK_DELETE_MAX_AMOUNT):
+            chunk = bulk[i:i + BULK_DELETE_MAX_AMOUNT]
+            if len(chunk) == 1:
+                single.extend(chunk)
+                continue
+            try:
+                await self._run("bulk_delete", lambda: self.bot.http.delete_messages(channel_id, chunk))
+                Metrics.incr("message_ops.bulk_deleted", len(chunk))
+            except discord.Forbidden:
+                logger.debug(f"Missing permissions to bulk delete in channel {channel_id}, deleting one by one")
+                if len(self.no_bulk_delete) > 10000:
+                    self.no_bulk_delete.clear()
+                self.no_bulk_delete.add(channel_id)
+                single.extend(bulk[i:])
+                break
+            except discord.HTTPException as e:
+                logger.debug(f"Bulk delete in channel {channel_id} failed ({e}), deleting one by one")
+                single.extend(chunk)
+        for message_id in single:
+            await self.delete(channel_id, message_id)
@@ -0,0 +1,94 @@
+import logging
+import time
+import typing
+
+logger = logging.getLogger("Neria.metrics")
+
+
+class Timing:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def avg(self):
+        if self.count == 0:
+            return 0.0
+        return self.total / self.count
+
+
+class TimedMetric:
+    """
+    Context manager that records the execution time into a timing metric
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.start_time = None
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        Metrics.observe(self.name, time.perf_counter() - self.start_time)
+
+
+class Metrics:
+    """
+    Process wide counters, timings and gauges.
+    Timings are collected per interval and reset every time the summary is logged.
+    """
+    COUNTERS: dict[str, int] = {}
+    TIMINGS: dict[str, Timing] = {}
+    GAUGES: dict[str, typing.Callable[[], typing.Any]] = {}
+
+    @classmethod
+    def incr(cls, name: str, amount=1):
+        cls.COUNTERS[name] = cls.COUNTERS.get(name, 0) + amount
+
+    @classmethod
+    def get(cls, name: str) -> int:
+        return cls.COUNTERS.get(name, 0)
+
+    @classmethod
+    def observe(cls, name: str, seconds: float):
+        timing = cls.TIMINGS.get(name)
+        if timing is None:
+            timing = Timing()
+            cls.TIMINGS[name] = timing
+        timing.observe(seconds)
+
+    @classmethod
+    def timed(cls, name: str) -> TimedMetric:
+        return TimedMetric(name)
+
+    @classmethod
+    def register_gauge(cls, name: str, getter: typing.Callable[[], typing.Any]):
+        cls.GAUGES[name] = getter
+
+    @classmethod
+    def snapshot(cls) -> dict:
+        return {
+            "counters": dict(cls.COUNTERS),
+            "timings": {k: {"count": v.count, "avg": v.avg, "max": v.max} for k, v in cls.TIMINGS.items()},
+            "gauges": {k: v() for k, v in cls.GAUGES.items()}
+        }
+
+    @classmethod
+    def log_summary(cls):
+        for name, value in sorted(cls.COUNTERS.items()):
+            logger.info(f"counter {name}={value}")
+        for name, getter in sorted(cls.GAUGES.items()):
+            logger.info(f"gauge {name}={getter()}")
+        for name, timing in sorted(cls.TIMINGS.items()):
+            logger.info(f"timing {name} count={timing.count} avg={round(timing.avg * 1000, 1)}ms "
+                        f"max={round(timing.max * 1000, 1)}ms")
+        cls.TIMINGS = {}
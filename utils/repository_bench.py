@@ -0,0 +1,112 @@
+"""
+Compares the read paths of :class:`persistence.repository.Repository` with the ORM queries they replaced.
+Runs read only against the configured database and picks the largest rosters, character lists and
+preset lists found there, so the numbers reflect real data.
+
+Usage: python -m utils.repository_bench [iterations] (or make bench-repository)
+"""
+import asyncio
+import logging
+import statistics
+import sys
+import time
+import typing
+
+from tortoise import Tortoise, connections
+
+from persistence import EventStates
+from persistence.models import Event, EventPreset, PlayerCharacter, Users
+from persistence.repository import Repository
+from persistence.roster import Roster
+from utils.config_manager import ConfigManager
+
+logger = logging.getLogger("Neria")
+
+SAMPLE_SIZE = 20
+
+
+async def _sample(sql: str) -> list[int]:
+    rows = await connections.get("main").execute_query_dict(sql, [SAMPLE_SIZE])
+    return [row["id"] for row in rows]
+
+
+async def _orm_roster(event_id: int):
+    return await Event.get(id=event_id).prefetch_related("server", "creator", "registered_users__character")
+
+
+async def _orm_profile(user_id: int):
+    user = await Users.get_or_none(id=user_id)
+    if user is not None:
+        await user.fetch_characters()
+        await user.fetch_registered_events()
+
+
+async def _repository_profile(user_id: int):
+    await Repository.fetch_characters(user_id)
+    await Repository.fetch_profile_events(user_id)
+
+
+async def _orm_upcoming(until: int):
+    return await Event.filter(event_start__lte=until, state=EventStates.PLANING)
+
+
+async def _time(func: typing.Callable[[int], typing.Awaitable], ids: list[int], iterations: int) -> list[float]:
+    for i in ids:
+        await func(i)  # Warm up caches and prepared statements
+    durations = []
+    for _ in range(iterations):
+        for i in ids:
+            start = time.perf_counter()
+            await func(i)
+            durations.append(time.perf_counter() - start)
+    return durations
+
+
+def _report(name: str, durations: list[float], baseline: typing.Optional[float] = None):
+    mean = statistics.fmean(durations) * 1000
+    p95 = statistics.quantiles(durations, n=20)[-1] * 1000 if len(durations) > 1 else mean
+    speedup = f", {round(baseline / mean, 2)}x" if baseline else ""
+    logger.info(f"{name:<26} mean={mean:.3f}ms p95={p95:.3f}ms{speedup}")
+    return mean
+
+
+async def run(iterations: int):
+    events = await _sample("""SELECT event_id AS id FROM eventregister
+                              GROUP BY event_id ORDER BY count(*) DESC LIMIT $1""")
+    users = await _sample("""SELECT user_id AS id FROM playercharacter
+                             GROUP BY user_id ORDER BY count(*) DESC LIMIT $1""")
+    servers = await _sample("""SELECT server_id AS id FROM eventpreset
+                               GROUP BY server_id ORDER BY count(*) DESC LIMIT $1""")
+    until = [int(time.time()) + 86400]
+    cases = [
+        ("roster", events, [("orm", _orm_roster), ("roster", Roster.load),
+                            ("repository", Repository.fetch_roster)]),
+        ("profile", users, [("orm", _orm_profile), ("repository", _repository_profile)]),
+        ("characters", users, [("orm", lambda i: PlayerCharacter.filter(user_id=i).order_by("id")),
+                               ("repository", Repository.fetch_characters)]),
+        ("preset_names", servers, [("orm", lambda i: EventPreset.filter(server_id=i)),
+                                   ("repository", Repository.fetch_preset_names)]),
+        ("upcoming_events", until, [("orm", _orm_upcoming), ("repository", Repository.fetch_upcoming_events)]),
+    ]
+    for case, ids, paths in cases:
+        if len(ids) == 0:
+            logger.info(f"{case}: no data to benchmark")
+            continue
+        baseline = None
+        for path, func in paths:
+            mean = _report(f"{case}.{path}", await _time(func, ids, iterations), baseline)
+            baseline = baseline or mean
+
+
+async def main(iterations: int):
+    await Tortoise.init(config=ConfigManager.load_tortoise_config())
+    try:
+        await run(iterations)
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    ConfigManager.load()
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
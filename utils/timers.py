@@ -0,0 +1,154 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import typing
+
+logger = logging.getLogger("Neria")
+
+
+class DeadlineQueue:
+    """
+    Calls a callback for keys once their deadline (unix timestamp) is reached.
+    Keys can be added, moved and removed at any time. All keys that are due at the same moment are
+    passed to the callback as one batch.
+    """
+
+    def __init__(self, name: str, callback: typing.Callable[[list], typing.Awaitable], max_sleep=300):
+        self.name = name
+        self.callback = callback
+        self.max_sleep = max_sleep  # Wake up from time to time in case the system clock changed
+        self.task: typing.Union[asyncio.Task, None] = None
+        self._deadlines: dict[typing.Hashable, float] = {}
+        self._heap: list[tuple[float, int, typing.Hashable]] = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, key):
+        return key in self._deadlines
+
+    def get(self, key, default=None):
+        return self._deadlines.get(key, default)
+
+    def set(self, key, deadline: float):
+        """
+        Add a key or move it to a new deadline.
+        """
+        if self._deadlines.get(key) == deadline:
+            return
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._counter), key))
+        if self._heap[0][2] == key:
+            self._wakeup.set()
+
+    def discard(self, key):
+        # The heap entry is dropped lazily once it surfaces
+        self._deadlines.pop(key, None)
+
+    def pop_due(self, now=None) -> list:
+        now = time.time() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, key = heapq.heappop(self._heap)
+            if self._deadlines.get(key) != deadline:
+                continue  # Stale entry, key was moved or removed
+            self._deadlines.pop(key)
+            due.append(key)
+        return due
+
+    def _dispatch(self, due: list):
+        logger.debug(f"Timer '{self.name}' fired for {len(due)} items")
+        task = asyncio.create_task(self.callback(due))
+
+        def callback(t: asyncio.Task):
+            if not t.cancelled() and t.exception():
+                logger.error(f"Exception in timer callback '{self.name}'", exc_info=t.exception())
+
+        task.add_done_callback(callback)
+
+    async def _run(self):
+        logger.info(f"Started timer '{self.name}' with {len(self)} items")
+        while True:
+            due = self.pop_due()
+            if due:
+                self._dispatch(due)
+            self._wakeup.clear()
+            timeout = self.max_sleep
+            if self._heap:
+                timeout = min(max(self._heap[0][0] - time.time(), 0), self.max_sleep)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_event_loop_policy().get_event_loop().create_task(self._run())
+
+    def shutdown(self):
+        if self.task:
+            self.task.cancel()
+
+
+class ReminderIndex:
+    """
+    Reminder deadlines (``event_start - notify_before``) grouped by event.
+    Moving or ending an event updates all reminders of it without touching the database.
+    """
+
+    def __init__(self, callback: typing.Callable[[list], typing.Awaitable]):
+        self.callback = callback
+        self.timers = DeadlineQueue("reminders", self._fire)
+        self._event_starts: dict[int, int] = {}
+        self._by_event: dict[int, dict[int, int]] = {}  # event_id -> {register_id: notify_before}
+        self._register_events: dict[int, int] = {}  # register_id -> event_id
+
+    def __len__(self):
+        return len(self._register_events)
+
+    def __contains__(self, register_id):
+        return register_id in self._register_events
+
+    def add(self, register_id: int, event_id: int, event_start: int, notify_before: int):
+        self.remove(register_id)
+        self._event_starts[event_id] = event_start
+        self._by_event.setdefault(event_id, {})[register_id] = notify_before
+        self._register_events[register_id] = event_id
+        self.timers.set(register_id, event_start - notify_before)
+
+    def remove(self, register_id: int):
+        event_id = self._register_events.pop(register_id, None)
+        if event_id is None:
+            return
+        self.timers.discard(register_id)
+        reminders = self._by_event[event_id]
+        reminders.pop(register_id)
+        if not reminders:
+            self._by_event.pop(event_id)
+            self._event_starts.pop(event_id)
+
+    def move_event(self, event_id: int, event_start: int):
+        if self._event_starts.get(event_id, event_start) == event_start:
+            return
+        self._event_starts[event_id] = event_start
+        for register_id, notify_before in self._by_event[event_id].items():
+            self.timers.set(register_id, event_start - notify_before)
+
+    def remove_event(self, event_id: int):
+        for register_id in list(self._by_event.get(event_id, ())):
+            self.remove(register_id)
+
+    async def _fire(self, register_ids: list):
+        for register_id in register_ids:
+            self.remove(register_id)
+        await self.callback(register_ids)
+
+    def start(self):
+        self.timers.start()
+
+    def shutdown(self):
+        self.timers.shutdown()
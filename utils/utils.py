@@ -3,14 +3,16 @@ import logging
 import os
 import time
 import typing
+from collections import deque
 from datetime import datetime, tzinfo, timedelta, timezone
 
 import discord
 import pytz
 from aiocache import cached
 
-from persistence.models import Server
+from persistence.repository import Repository
 from errors.basic import DateConversionError, DateTimeInPast, NumberConversionError, InvalidNumber, RoleNotFound
+from utils.metrics import Metrics
 
 DATETIME_FORMAT = '%d.%m.%y/%H:%M%z'
 
@@ -34,10 +36,8 @@ def scan_cogs() -> typing.List[str]:
 class CachedQueries:
     @classmethod
     @cached(ttl=10)
-    async def fetch_event_presets(cls, server_id):
-        server = await Server.get_safe(server_id)
-        await server.fetch_event_presets()
-        return server.event_presets
+    async def fetch_preset_names(cls, server_id) -> list[str]:
+        return await Repository.fetch_preset_names(server_id)
 
 
 def strip_text(text: str):
@@ -153,41 +153,84 @@ def build_fields(embed: discord.Embed, title, to_write, no_value, spacer=True, i
 
 
 class Cooldown:
-
-    def __init__(self, ttl, maxsize=100):
-        self.maxsize = maxsize
+    """
+    Cooldown store with amortized O(1) inserts and expiry.
+    Keys are put into buckets by their expiry time. Buckets are appended in expiry order,
+    so expired keys are always removed from the front without scanning the whole map.
+    """
+    SHARED: dict[str, "Cooldown"] = {}
+
+    def __init__(self, ttl, limit=1, resolution=1.0):
+        """
+        :param ttl: Seconds a key stays on cooldown after its first use
+        :param limit: Uses allowed per key within ``ttl``
+        :param resolution: Width of the expiry buckets in seconds
+        """
         self.ttl = ttl
-        self.map = dict()
+        self.limit = limit
+        self.resolution = resolution
+        self.map: dict[typing.Hashable, list] = dict()
+        self.buckets: deque[tuple[int, list]] = deque()  # (bucket index, keys)
+
+    @classmethod
+    def get_shared(cls, name: str, ttl, limit=1) -> "Cooldown":
+        """
+        Cooldown shared by every instance of e.g. a persistent view
+        """
+        cooldown = cls.SHARED.get(name)
+        if cooldown is None:
+            cooldown = cls(ttl, limit)
+            cls.SHARED[name] = cooldown
+            Metrics.register_gauge(f"cooldown.{name}.keys", cooldown.__len__)
+        return cooldown
+
+    def __len__(self):
+        return len(self.map)
 
     def add_item(self, item):
-        self.map[item] = time.time()
-        if len(self.map) > self.maxsize:
-            self.clear()
+        now = time.monotonic()
+        self.clear(now)
+        entry = self.map.get(item)
+        if entry is not None and now - entry[0] < self.ttl:
+            entry[1] += 1
+            return
+        index = int((now + self.ttl) // self.resolution) + 1
+        self.map[item] = [now, 1, index]  # first use, uses, expiry bucket
+        if self.buckets and self.buckets[-1][0] == index:
+            self.buckets[-1][1].append(item)
+        else:
+            self.buckets.append((index, [item]))
 
     def get_remaining(self, item):
-        t = self.map[item]
-        ret = t - time.time()
-        if ret > 0:
-            ret = 0
-        return self.ttl - round(abs(ret))
-
-    def clear(self):
-        to_del = []
-        for k, _ in self.map.items():
-            if self.can_execute(k):
-                to_del.append(k)
-        for i in to_del:
-            self.map.pop(i)
+        entry = self.map.get(item)
+        if entry is None:
+            return 0
+        return max(self.ttl - round(time.monotonic() - entry[0]), 0)
+
+    def clear(self, now=None):
+        """
+        Drop expired keys
+        """
+        if now is None:
+            now = time.monotonic()
+        current = int(now // self.resolution)
+        while self.buckets and self.buckets[0][0] <= current:
+            index, keys = self.buckets.popleft()
+            for key in keys:
+                entry = self.map.get(key)
+                # The key may have expired and been added again into a later bucket
+                if entry is not None and entry[2] == index:
+                    self.map.pop(key)
 
     def can_execute(self, item):
-        i = self.map.get(item, None)
-        if i is None:
+        entry = self.map.get(item, None)
+        if entry is None:
             return True
 
-        if time.time() - i >= self.ttl:
+        if time.monotonic() - entry[0] >= self.ttl:
             return True
 
-        return False
+        return entry[1] < self.limit
 
 
 class TimingContext: